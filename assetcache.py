@@ -0,0 +1,92 @@
+"""Persistent on-disk cache of decoded, pre-processed assets.
+
+Every asset is stored as one raw .npy pixel array, already cut out, scaled and shaded, under
+a key made from its source files (path, modification time, size) and its load parameters.
+A cache hit memory-maps that array instead of decoding PNGs; a miss runs the asset's build
+function and writes the result for next time. The arrays hold plain RGB(A) values, so they
+do not depend on the display's pixel format; turning them into Surfaces is left to graphics.
+
+Loads run on a small thread pool (submit), so cache misses decode in parallel.
+"""
+import concurrent.futures
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+import config
+
+# Bump when a build function changes its output, to invalidate existing cache entries
+FORMAT_VERSION = 1
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def cache_key(name, sources, params):
+    """Returns the cache file stem for an asset. Raises OSError if a source file is missing.
+
+    The stem is '<name>-<parameters digest>-<sources digest>': entries that only differ in the
+    last part are older versions of the same asset.
+    """
+    params_digest = hashlib.sha1(repr((FORMAT_VERSION, name, list(sources), params)).encode())
+    sources_digest = hashlib.sha1()
+    for path in sources:
+        stat = os.stat(path)
+        sources_digest.update(repr((os.path.abspath(path), stat.st_mtime_ns, stat.st_size)).encode())
+    return f"{name}-{params_digest.hexdigest()[:12]}-{sources_digest.hexdigest()[:12]}"
+
+def load(name, sources, params, build, cache_dir=None):
+    """Returns the array of asset `name`, memory-mapped from the cache when it is there.
+
+    `sources` are the files the asset is made from and `params` anything else its content
+    depends on (must have a stable repr). On a miss, build() makes the array, which is then
+    cached. Exceptions from build() propagate and nothing is cached. With `cache_dir` (default
+    config.ASSET_CACHE_DIR) None, this just calls build().
+    """
+    if cache_dir is None:
+        cache_dir = config.ASSET_CACHE_DIR
+    if not cache_dir:
+        return build()
+    try:
+        key = cache_key(name, sources, params)
+    except OSError:
+        return build() # Missing source file: let build() report it
+    path = os.path.join(cache_dir, key + '.npy')
+    try:
+        return np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        pass # Not cached yet, or an unreadable entry that gets rewritten below
+
+    array = build()
+    try:
+        _write(cache_dir, key, array)
+    except OSError as e:
+        print(f"Warning: could not cache asset '{name}': {e}")
+    return array
+
+def _write(cache_dir, key, array):
+    """Writes a cache entry atomically and deletes the older versions it replaces."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, key + '.npy')
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(temp_path, path)
+    # Same name and parameters but different source files: the asset was edited since
+    stale_prefix = key.rsplit('-', 1)[0] + '-'
+    for entry in os.listdir(cache_dir):
+        if entry.startswith(stale_prefix) and entry.endswith('.npy') and entry != key + '.npy':
+            try:
+                os.remove(os.path.join(cache_dir, entry))
+            except OSError:
+                pass
+
+def submit(name, sources, params, build, cache_dir=None):
+    """Starts load() on the loader thread pool and returns a concurrent.futures.Future."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(config.ASSET_LOAD_THREADS,
+                                                              thread_name_prefix='asset-loader')
+    return _executor.submit(load, name, sources, params, build, cache_dir)
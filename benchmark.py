@@ -0,0 +1,583 @@
+#/usr/bin/env python3
+"""Headless rendering benchmark.
+
+Flies the camera along scripted, reproducible paths through the map and renders every
+frame into an offscreen Surface with the SDL dummy video driver, without an FPS cap.
+Reports mean/p50/p95/p99 milliseconds per frame, split into raycast and draw time, and
+writes the results as JSON for regression tracking on machines without a GPU. Asset loading
+is timed too, with and without the asset cache.
+
+    python benchmark.py --frames 600 --output bench.json
+    python benchmark.py --workers 16     # frame time scaling of parallel.py from 1 to 16 workers
+    python benchmark.py --map big.rcmap  # a map file written by `python map.py big.rcmap 4096`
+    python benchmark.py --entities 5000  # also draw 5000 sprites scattered over the map
+    python benchmark.py --batch 1024     # batched observations (observations.py), batch sizes 1 to 1024
+    python benchmark.py --floor-budget-ms 4  # fail if the textured floor costs more than 4 ms/frame
+    python benchmark.py --raycast-mode spans # render the paths with span-coherent casting
+    python benchmark.py --indexed            # render the paths in 8-bit indexed color with fog
+    python benchmark.py --queries 1000000    # line-of-sight and hitscan queries per second
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy') # Must be set before pygame initializes video
+
+import numpy as np
+import pygame
+import config
+import entities
+import map as game_map
+import graphics
+import observations
+import parallel
+import queries
+import raycaster
+import simulation
+
+# Waypoint loop through the corridors of the default MAP_DATA
+CORRIDOR_WAYPOINTS = [
+    (1.5, 1.5), (14.5, 1.5), (14.5, 6.5), (12.5, 6.5), (12.5, 8.5), (6.5, 8.5),
+    (6.5, 6.5), (3.5, 6.5), (3.5, 3.5), (1.5, 3.5), (1.5, 1.5),
+]
+# Longest open sightlines in MAP_DATA: the row 6 hall
+OPEN_ROOM_WAYPOINTS = [(3.5, 6.5), (14.5, 6.5), (3.5, 6.5)]
+ROTATE_POSITION = (6.5, 6.5)
+
+def _follow_waypoints(waypoints, num_frames):
+    """Returns (x, y, angle) per frame moving at constant speed along the waypoints."""
+    points = np.array(waypoints, dtype=np.float64)
+    segment_lengths = np.hypot(*np.diff(points, axis=0).T)
+    cumulative = np.concatenate([[0.0], np.cumsum(segment_lengths)])
+    travelled = np.linspace(0.0, cumulative[-1], num_frames, endpoint=False)
+    segment = np.clip(np.searchsorted(cumulative, travelled, side='right') - 1, 0, len(segment_lengths) - 1)
+    t = (travelled - cumulative[segment]) / segment_lengths[segment]
+    start, end = points[segment], points[segment + 1]
+    xy = start + (end - start) * t[:, None]
+    angle = np.arctan2(end[:, 1] - start[:, 1], end[:, 0] - start[:, 0])
+    return xy[:, 0], xy[:, 1], angle
+
+def corridor_path(num_frames):
+    """Walks the corridor loop, looking where it is going."""
+    return _follow_waypoints(CORRIDOR_WAYPOINTS, num_frames)
+
+def open_room_path(num_frames):
+    """Walks the open hall and back while sweeping the view from side to side."""
+    x, y, angle = _follow_waypoints(OPEN_ROOM_WAYPOINTS, num_frames)
+    sweep = (math.pi / 2) * np.sin(np.linspace(0.0, 8 * math.pi, num_frames))
+    return x, y, angle + sweep
+
+def rotate_path(num_frames):
+    """Turns a full circle on the spot (the player start on maps other than MAP_DATA)."""
+    position = ROTATE_POSITION
+    if game_map.GRID[int(position[1]), int(position[0])] != 0:
+        position = (config.PLAYER_INITIAL_X, config.PLAYER_INITIAL_Y)
+    x = np.full(num_frames, position[0])
+    y = np.full(num_frames, position[1])
+    angle = np.linspace(0.0, 2 * math.pi, num_frames, endpoint=False)
+    return x, y, angle
+
+def survey_path(num_frames):
+    """Walks the longest straight run of empty cells in any map row, looking along it.
+
+    Works on any map; on large maps this gives the long rays that stress the DDA.
+    """
+    free = np.pad(game_map.GRID == 0, ((0, 0), (1, 1)))
+    edges = np.diff(free.astype(np.int8), axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1) # Same row-major order as the starts
+    longest = np.argmax(ends - starts)
+    y = rows[longest] + 0.5
+    waypoints = [(starts[longest] + 0.5, y), (ends[longest] - 0.5, y)]
+    x, y, angle = _follow_waypoints(waypoints, num_frames)
+    sweep = (math.pi / 6) * np.sin(np.linspace(0.0, 4 * math.pi, num_frames))
+    return x, y, angle + sweep
+
+CAMERA_PATHS = {
+    'corridor': corridor_path,
+    'open_room': open_room_path,
+    'rotate': rotate_path,
+    'survey': survey_path,
+}
+# The corridor and open_room waypoints only fit MAP_DATA
+GENERIC_PATHS = ['rotate', 'survey']
+
+def frame_time_stats(samples_ms):
+    """Summarizes a list of per-frame timings in milliseconds."""
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        'mean': float(samples.mean()),
+        'p50': float(np.percentile(samples, 50)),
+        'p95': float(np.percentile(samples, 95)),
+        'p99': float(np.percentile(samples, 99)),
+        'max': float(samples.max()),
+    }
+
+def run_path(screen, path_name, num_frames, warmup_frames=10, parallel_renderer=None, world_entities=None):
+    """Renders one camera path and returns its timing statistics.
+
+    With `world_entities`, their sprites are drawn every frame too, as part of draw time.
+    Draw time includes the floor/ceiling pass, which is also reported on its own.
+
+    With a parallel.ParallelRenderer, raycast and draw happen together in the workers, so
+    only the whole frame time is reported.
+    """
+    xs, ys, angles = CAMERA_PATHS[path_name](num_frames)
+    for x, y in zip(xs, ys):
+        if game_map.GRID[int(y), int(x)] != 0:
+            raise ValueError(f"Camera path '{path_name}' passes through a wall at ({x:.2f}, {y:.2f})")
+    angles = (angles + 2 * math.pi) % (2 * math.pi) # Normalize like the game loop does
+
+    pistol_idle_img = graphics.game_assets.get('pistol_idle')
+    pistol_rect = None
+    if pistol_idle_img:
+        pistol_rect = pistol_idle_img.get_rect()
+        pistol_rect.centerx = config.SCREEN_WIDTH // 2
+        pistol_rect.bottom = config.SCREEN_HEIGHT - config.PISTOL_Y_OFFSET
+
+    raycast_ms, background_ms, draw_ms, frame_ms = [], [], [], []
+    for i in range(-warmup_frames, num_frames):
+        x, y, angle = float(xs[i % num_frames]), float(ys[i % num_frames]), float(angles[i % num_frames])
+
+        frame_start = time.perf_counter()
+        if parallel_renderer:
+            depth_buffer = parallel_renderer.render(screen, x, y, angle)
+            if world_entities is not None:
+                entities.draw_sprites(screen, world_entities, x, y, angle, depth_buffer)
+            graphics.draw_weapon(screen, pistol_idle_img, pistol_rect)
+            frame_end = time.perf_counter()
+            if i >= 0:
+                frame_ms.append((frame_end - frame_start) * 1000)
+            continue
+
+        hits = raycaster.cast_rays(x, y, angle)
+        raycast_end = time.perf_counter()
+        view = graphics.view_surface(screen)
+        graphics.draw_floor_and_ceiling(view, x, y, angle)
+        background_end = time.perf_counter()
+        graphics.draw_walls(view, hits)
+        graphics.present_view(screen, view)
+        if world_entities is not None:
+            entities.draw_sprites(screen, world_entities, x, y, angle, raycaster.depth_buffer(hits))
+        graphics.draw_weapon(screen, pistol_idle_img, pistol_rect)
+        frame_end = time.perf_counter()
+
+        if i >= 0:
+            raycast_ms.append((raycast_end - frame_start) * 1000)
+            background_ms.append((background_end - raycast_end) * 1000)
+            draw_ms.append((frame_end - raycast_end) * 1000)
+            frame_ms.append((frame_end - frame_start) * 1000)
+
+    result = {
+        'frames': num_frames,
+        'frame_ms': frame_time_stats(frame_ms),
+    }
+    if raycast_ms:
+        result['raycast_ms'] = frame_time_stats(raycast_ms)
+        result['draw_ms'] = frame_time_stats(draw_ms)
+        result['background_ms'] = frame_time_stats(background_ms) # Floor and ceiling, part of draw_ms
+        result['rays_per_second'] = config.NUM_RAYS * num_frames / (sum(raycast_ms) / 1000)
+    return result
+
+def compare_raycast_modes(path_names, num_frames):
+    """Times raycaster.cast_rays in each config.RAYCAST_MODE along the camera paths.
+
+    Returns {path: {mode: raycast stats, 'mismatched_frames': count}}, where a mismatched frame
+    is one whose RayHits differ between the modes (there should be none).
+    """
+    configured_mode = config.RAYCAST_MODE
+    comparison = {}
+    for path_name in path_names:
+        xs, ys, angles = CAMERA_PATHS[path_name](num_frames)
+        angles = (angles + 2 * math.pi) % (2 * math.pi)
+        timings = {'columns': [], 'spans': []}
+        mismatched = 0
+        for x, y, angle in zip(xs.tolist(), ys.tolist(), angles.tolist()):
+            frame_hits = []
+            for mode, samples in timings.items():
+                config.RAYCAST_MODE = mode
+                start = time.perf_counter()
+                frame_hits.append(raycaster.cast_rays(x, y, angle))
+                samples.append((time.perf_counter() - start) * 1000)
+            mismatched += not all(np.array_equal(a, b) for a, b in zip(*frame_hits))
+        config.RAYCAST_MODE = configured_mode
+        comparison[path_name] = {mode: frame_time_stats(samples) for mode, samples in timings.items()}
+        comparison[path_name]['mismatched_frames'] = mismatched
+        print(f"{path_name:>10}: raycast columns {comparison[path_name]['columns']['mean']:.2f} ms, "
+              f"spans {comparison[path_name]['spans']['mean']:.2f} ms, {mismatched} mismatched frames")
+    return comparison
+
+def compare_empty_space_skip(count, seed=0):
+    """Casts rays with and without the map's clearance field and counts the rays whose results
+    differ (there should be none), timing both.
+
+    The rays start from `count` random empty cells, at the cell centre and at a random point,
+    and go in the axis-aligned and diagonal directions, which pass exactly through grid
+    corners, and in random directions. Maps too small for a clearance field get one made here.
+    Returns {'rays', 'mismatched_rays', 'with_skip_ms', 'without_skip_ms'}.
+    """
+    clearance = game_map.CLEARANCE if game_map.CLEARANCE is not None else game_map.compute_clearance(game_map.GRID)
+    rng = np.random.default_rng(seed)
+    free_y, free_x = np.nonzero(game_map.GRID == 0)
+    cells = rng.integers(0, free_x.size, count)
+    origins = [(free_x[cells] + 0.5, free_y[cells] + 0.5),
+               (free_x[cells] + rng.uniform(0.0, 1.0, count), free_y[cells] + rng.uniform(0.0, 1.0, count))]
+    directions = [(math.cos(angle), math.sin(angle)) for angle in np.arange(8) * (math.pi / 4)]
+    random_angles = rng.uniform(0.0, 2 * math.pi, count)
+    directions.append((np.cos(random_angles), np.sin(random_angles)))
+
+    mismatched = rays = 0
+    timings = {'with_skip_ms': 0.0, 'without_skip_ms': 0.0}
+    for origin_x, origin_y in origins:
+        for dir_x, dir_y in directions:
+            results = []
+            for name, field in (('with_skip_ms', clearance), ('without_skip_ms', None)):
+                start = time.perf_counter()
+                results.append(raycaster.cast(origin_x, origin_y, dir_x, dir_y, game_map.GRID, field))
+                timings[name] += (time.perf_counter() - start) * 1000
+            differs = np.zeros(count, dtype=bool)
+            for with_skip, without_skip in zip(*results):
+                differs |= with_skip != without_skip
+            mismatched += int(differs.sum())
+            rays += count
+    print(f"empty-space skip: {timings['with_skip_ms']:.1f} ms with, {timings['without_skip_ms']:.1f} ms without "
+          f"for {rays:,} rays, {mismatched} mismatched rays")
+    return {'rays': rays, 'mismatched_rays': mismatched, **timings}
+
+def measure_static_camera(screen, num_frames):
+    """Times frames of the weapon firing in front of a still camera, drawn in full and with
+    the view reused from a graphics.SceneCache the way the game loop does.
+
+    Returns {'full': stats, 'reused': stats}. Full frames include storing the view in the cache
+    and reused ones restoring it under the weapon; the display update itself is left out, as
+    there is no display here.
+    """
+    pistol_frames = graphics.game_assets.get('pistol_fire_frames') or [graphics.game_assets.get('pistol_idle')]
+    pistol_rect = pistol_frames[0].get_rect() if pistol_frames[0] else None
+    if pistol_rect:
+        pistol_rect.centerx = config.SCREEN_WIDTH // 2
+        pistol_rect.bottom = config.SCREEN_HEIGHT - config.PISTOL_Y_OFFSET
+    x, y, angle = config.PLAYER_INITIAL_X, config.PLAYER_INITIAL_Y, config.PLAYER_INITIAL_ANGLE
+    scene_cache = graphics.SceneCache()
+    timings = {'full': [], 'reused': []}
+    for i in range(num_frames):
+        pistol_img = pistol_frames[i % len(pistol_frames)]
+        start = time.perf_counter()
+        graphics.draw_floor_and_ceiling(screen, x, y, angle)
+        hits = raycaster.cast_rays(x, y, angle)
+        graphics.draw_walls(screen, hits)
+        scene_cache.store(screen, (x, y, angle))
+        weapon_rect = graphics.draw_weapon(screen, pistol_img, pistol_rect)
+        middle = time.perf_counter()
+        scene_cache.restore(screen, [weapon_rect] if weapon_rect else [])
+        pistol_img = pistol_frames[(i + 1) % len(pistol_frames)]
+        weapon_rect = graphics.draw_weapon(screen, pistol_img, pistol_rect)
+        end = time.perf_counter()
+        timings['full'].append((middle - start) * 1000)
+        timings['reused'].append((end - middle) * 1000)
+    return {name: frame_time_stats(samples) for name, samples in timings.items()}
+
+def measure_indexed_color(screen, num_frames):
+    """Times the floor, ceiling and walls drawn in full color and through the 8-bit indexed path
+    (palette.py) over a full turn on the spot, including copying the 8-bit view to the screen.
+
+    Returns {'rgb': stats, 'indexed': stats, 'framebuffer_bytes': {'rgb', 'indexed'}}.
+    """
+    if graphics.game_assets.get('palette') is None:
+        graphics.load_indexed_textures()
+    configured = config.INDEXED_COLOR
+    xs, ys, angles = rotate_path(num_frames)
+    timings = {'rgb': [], 'indexed': []}
+    framebuffer_bytes = {}
+    for x, y, angle in zip(xs.tolist(), ys.tolist(), angles.tolist()):
+        hits = raycaster.cast_rays(x, y, angle)
+        for name, samples in timings.items():
+            config.INDEXED_COLOR = name == 'indexed'
+            start = time.perf_counter()
+            view = graphics.view_surface(screen)
+            graphics.draw_floor_and_ceiling(view, x, y, angle)
+            graphics.draw_walls(view, hits)
+            graphics.present_view(screen, view)
+            samples.append((time.perf_counter() - start) * 1000)
+            framebuffer_bytes[name] = view.get_pitch() * view.get_height()
+    config.INDEXED_COLOR = configured
+    result = {name: frame_time_stats(samples) for name, samples in timings.items()}
+    result['framebuffer_bytes'] = framebuffer_bytes
+    return result
+
+def measure_floor_pass(screen, num_frames):
+    """Times the floor/ceiling pass textured and as flat fills over a full turn on the spot.
+
+    Returns {'textured': stats, 'flat': stats, 'added_ms': mean difference}.
+    """
+    xs, ys, angles = rotate_path(num_frames)
+    timings = {'textured': [], 'flat': []}
+    for x, y, angle in zip(xs, ys, angles):
+        start = time.perf_counter()
+        graphics.draw_floor_and_ceiling(screen, float(x), float(y), float(angle))
+        middle = time.perf_counter()
+        graphics.draw_background(screen)
+        end = time.perf_counter()
+        timings['textured'].append((middle - start) * 1000)
+        timings['flat'].append((end - middle) * 1000)
+    result = {name: frame_time_stats(samples) for name, samples in timings.items()}
+    result['added_ms'] = result['textured']['mean'] - result['flat']['mean']
+    return result
+
+def measure_simulation(num_ticks):
+    """Runs the simulation headless for `num_ticks` ticks of scripted input (walking, turning,
+    strafing into walls and firing) and returns ticks per second."""
+    script = [simulation.TickInput(forward=1, turn=1)] * 45 + [simulation.TickInput(strafe=-1)] * 30 + \
+             [simulation.TickInput(forward=-1, strafe=1, turn=-1)] * 44 + [simulation.TickInput(fire=True)]
+    inputs = [script[i % len(script)] for i in range(num_ticks)]
+    world = simulation.World(num_fire_frames=len(config.PISTOL_FIRE_FRAME_PATHS))
+    start = time.perf_counter()
+    simulation.run(world, inputs)
+    elapsed = time.perf_counter() - start
+    return {'ticks': num_ticks, 'ticks_per_second': num_ticks / elapsed, 'shots_fired': world.shots_fired}
+
+def random_poses(count, seed=0):
+    """Returns (x, y, angle) arrays of `count` random camera poses in empty cells of the map."""
+    rng = np.random.default_rng(seed)
+    free_y, free_x = np.nonzero(game_map.GRID == 0)
+    cells = rng.integers(0, free_x.size, count)
+    return (free_x[cells] + rng.uniform(0.2, 0.8, count), free_y[cells] + rng.uniform(0.2, 0.8, count),
+            rng.uniform(0.0, 2 * math.pi, count))
+
+def measure_queries(count, min_seconds=0.5):
+    """Measures queries.py throughput on `count` random queries per call. Returns
+    {'line_of_sight', 'line_of_sight_short', 'trace', 'hitscan'} in queries per second.
+
+    line_of_sight joins random points anywhere in empty cells, line_of_sight_short random
+    points within 8 cells of each other (like guards checking on a nearby player), trace
+    casts unbounded rays and hitscan fires rays at 100 scattered entities.
+    """
+    rng = np.random.default_rng(0)
+    start_x, start_y, angle = random_poses(count, seed=1)
+    end_x, end_y, _ = random_poses(count, seed=2)
+    near_x = np.clip(start_x + rng.uniform(-8, 8, count), 0, game_map.MAP_WIDTH - 1e-6)
+    near_y = np.clip(start_y + rng.uniform(-8, 8, count), 0, game_map.MAP_HEIGHT - 1e-6)
+    targets = entities.Entities()
+    targets.scatter(100, seed=3)
+    cases = {
+        'line_of_sight': lambda: queries.line_of_sight(start_x, start_y, end_x, end_y),
+        'line_of_sight_short': lambda: queries.line_of_sight(start_x, start_y, near_x, near_y),
+        'trace': lambda: queries.trace(start_x, start_y, np.cos(angle), np.sin(angle)),
+        'hitscan': lambda: queries.hitscan(start_x, start_y, angle, targets),
+    }
+    result = {}
+    for name, query in cases.items():
+        query() # Warm up
+        calls = 0
+        start = time.perf_counter()
+        while calls < 3 or time.perf_counter() - start < min_seconds:
+            query()
+            calls += 1
+        result[name] = count * calls / (time.perf_counter() - start)
+    print("queries: " + ", ".join(f"{name} {rate:,.0f}/s" for name, rate in result.items()) +
+          f" (batches of {count:,})")
+    return result
+
+def measure_batch_rendering(max_batch, width=64, height=64, min_seconds=0.5):
+    """Measures observations.render_frames and depth_buffers throughput for batch sizes
+    1, 2, 4, ... max_batch of random cameras. Returns {batch: {'frames_per_second',
+    'depth_per_second'}}, counting one camera's observation as one frame."""
+    scaling = {}
+    batch = 1
+    while batch <= max_batch:
+        x, y, angle = random_poses(batch, seed=batch)
+        result = {}
+        for name, render in (('frames_per_second', lambda: observations.render_frames(x, y, angle, width=width, height=height)),
+                             ('depth_per_second', lambda: observations.depth_buffers(x, y, angle, num_rays=width))):
+            render() # Warm up
+            calls = 0
+            start = time.perf_counter()
+            while calls < 3 or time.perf_counter() - start < min_seconds:
+                render()
+                calls += 1
+            result[name] = batch * calls / (time.perf_counter() - start)
+        scaling[batch] = result
+        print(f"batch {batch:>5}: {result['frames_per_second']:10,.0f} frames/s {width}x{height}, "
+              f"{result['depth_per_second']:10,.0f} depth buffers/s")
+        batch *= 2
+    return scaling
+
+def run_worker_scaling(screen, path_names, num_frames, max_workers, world_entities=None):
+    """Runs the paths with the parallel renderer for 1..max_workers workers.
+
+    Returns {workers: {path: result}} and prints the mean frame time and the speedup over
+    one worker for each count.
+    """
+    scaling = {}
+    for num_workers in range(1, max_workers + 1):
+        parallel_renderer = parallel.ParallelRenderer(num_workers)
+        try:
+            scaling[num_workers] = {path_name: run_path(screen, path_name, num_frames,
+                                                        parallel_renderer=parallel_renderer,
+                                                        world_entities=world_entities)
+                                    for path_name in path_names}
+        finally:
+            parallel_renderer.close()
+        means = [scaling[num_workers][p]['frame_ms']['mean'] for p in path_names]
+        baseline = [scaling[1][p]['frame_ms']['mean'] for p in path_names]
+        speedup = sum(baseline) / sum(means)
+        print(f"{num_workers:>3} workers: " +
+              ", ".join(f"{p} {m:6.2f} ms" for p, m in zip(path_names, means)) +
+              f"  (x{speedup:.2f} vs 1 worker)")
+    return scaling
+
+def measure_asset_loading(repeats=5):
+    """Times graphics.load_all_assets without the asset cache, with an empty cache and a filled one.
+
+    Only what load_all_assets waits for is timed; lazily loaded assets are finished after each
+    run so they do not spill into the next. Returns the best of `repeats` runs in milliseconds.
+    """
+    configured_cache_dir = config.ASSET_CACHE_DIR
+    timings = {'uncached': [], 'cold_cache': [], 'warm_cache': []}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for i in range(repeats):
+            for label, cache_dir in (('uncached', None),
+                                     ('cold_cache', os.path.join(temp_dir, f'cold{i}')),
+                                     ('warm_cache', os.path.join(temp_dir, 'warm'))):
+                config.ASSET_CACHE_DIR = cache_dir
+                with contextlib.redirect_stdout(io.StringIO()): # Skip the "loaded" messages
+                    start = time.perf_counter()
+                    graphics.load_all_assets()
+                    timings[label].append((time.perf_counter() - start) * 1000)
+                    for name in ('wall_texture', 'sprite_opaque', 'pistol_fire_frames'):
+                        graphics.game_assets.get(name)
+        config.ASSET_CACHE_DIR = configured_cache_dir
+    graphics.load_all_assets()
+    # The first warm run filled the cache
+    timings['warm_cache'] = timings['warm_cache'][1:] or timings['warm_cache']
+    return {label: min(samples) for label, samples in timings.items()}
+
+def init_headless():
+    """Initializes pygame without a window and returns an offscreen render target."""
+    pygame.init()
+    pygame.display.set_mode((1, 1)) # Needed for Surface.convert() in the asset loaders
+    graphics.load_all_assets()
+    return pygame.Surface((config.SCREEN_WIDTH, config.SCREEN_HEIGHT)).convert()
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless raycaster benchmark")
+    parser.add_argument('--frames', type=int, default=300, help="Frames rendered per camera path")
+    parser.add_argument('--paths', nargs='+', choices=sorted(CAMERA_PATHS),
+                        help="Camera paths to run (default: all, or the map-independent ones with --map)")
+    parser.add_argument('--map', help="Binary map file to load instead of MAP_DATA (see map.py)")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Also measure the parallel renderer with 1..N worker processes")
+    parser.add_argument('--entities', type=int, default=0,
+                        help="Scatter this many sprite entities over the map and draw them")
+    parser.add_argument('--ticks', type=int, default=100000,
+                        help="Simulation ticks to run headless for the ticks/s measurement (0 skips it)")
+    parser.add_argument('--queries', type=int, default=100000,
+                        help="Batch size for the line-of-sight/hitscan queries/s measurement (0 skips it)")
+    parser.add_argument('--skip-rays', type=int, default=20000,
+                        help="Start cells for the empty-space skip equality check (0 skips it)")
+    parser.add_argument('--batch', type=int, default=0,
+                        help="Also measure batched observation rendering for batch sizes 1..N (e.g. 1024)")
+    parser.add_argument('--batch-resolution', type=int, nargs=2, default=[64, 64], metavar=('WIDTH', 'HEIGHT'),
+                        help="Frame size for --batch (default 64 64)")
+    parser.add_argument('--raycast-mode', choices=['columns', 'spans'],
+                        help="Override config.RAYCAST_MODE for the path runs (both are compared either way)")
+    parser.add_argument('--indexed', action='store_true',
+                        help="Render the paths through the 8-bit indexed-color path (config.INDEXED_COLOR)")
+    parser.add_argument('--floor-budget-ms', type=float,
+                        help="Exit with an error if the textured floor/ceiling adds more than this to a frame")
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    args = parser.parse_args()
+    if args.map:
+        game_map.load_map(args.map)
+    if args.paths is None:
+        args.paths = GENERIC_PATHS if args.map else list(CAMERA_PATHS)
+    if args.raycast_mode:
+        config.RAYCAST_MODE = args.raycast_mode
+    if args.indexed:
+        config.INDEXED_COLOR = True
+
+    screen = init_headless()
+    world_entities = None
+    if args.entities > 0:
+        world_entities = entities.Entities()
+        world_entities.scatter(args.entities)
+    results = {
+        'resolution': [config.SCREEN_WIDTH, config.SCREEN_HEIGHT],
+        'num_rays': config.NUM_RAYS,
+        'map': args.map or 'MAP_DATA',
+        'map_size': [game_map.MAP_WIDTH, game_map.MAP_HEIGHT],
+        'empty_space_skipping': game_map.CLEARANCE is not None,
+        'raycast_mode': config.RAYCAST_MODE,
+        'indexed_color': config.INDEXED_COLOR,
+        'entities': args.entities,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pygame': pygame.version.ver,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'paths': {},
+    }
+    results['asset_load_ms'] = measure_asset_loading()
+    print("asset loading: " + ", ".join(f"{label} {ms:.2f} ms" for label, ms in results['asset_load_ms'].items()))
+
+    if args.ticks > 0:
+        results['simulation'] = measure_simulation(args.ticks)
+        print(f"simulation: {results['simulation']['ticks_per_second']:,.0f} ticks/s headless")
+
+    if graphics.game_assets.get('floor_columns') is not None:
+        results['floor_pass'] = measure_floor_pass(screen, args.frames)
+        print(f"floor/ceiling: {results['floor_pass']['textured']['mean']:.2f} ms textured, "
+              f"{results['floor_pass']['flat']['mean']:.2f} ms flat, "
+              f"+{results['floor_pass']['added_ms']:.2f} ms per frame")
+
+    results['static_camera'] = measure_static_camera(screen, args.frames)
+    print(f"static camera, weapon firing: {results['static_camera']['full']['mean']:.2f} ms full frame, "
+          f"{results['static_camera']['reused']['mean']:.2f} ms with the view reused")
+
+    results['indexed_color_pass'] = measure_indexed_color(screen, args.frames)
+    print(f"floor, ceiling and walls: {results['indexed_color_pass']['rgb']['mean']:.2f} ms full color, "
+          f"{results['indexed_color_pass']['indexed']['mean']:.2f} ms indexed with fog "
+          f"(framebuffer {results['indexed_color_pass']['framebuffer_bytes']['rgb'] // 1024} KiB -> "
+          f"{results['indexed_color_pass']['framebuffer_bytes']['indexed'] // 1024} KiB)")
+
+    for path_name in args.paths:
+        result = run_path(screen, path_name, args.frames, world_entities=world_entities)
+        results['paths'][path_name] = result
+        print(f"{path_name:>10}: frame {result['frame_ms']['mean']:6.2f} ms mean, "
+              f"{result['frame_ms']['p50']:6.2f} p50, {result['frame_ms']['p95']:6.2f} p95, "
+              f"{result['frame_ms']['p99']:6.2f} p99 "
+              f"(raycast {result['raycast_ms']['mean']:.2f} ms, draw {result['draw_ms']['mean']:.2f} ms)")
+
+    results['raycast_modes'] = compare_raycast_modes(args.paths, args.frames)
+    if args.skip_rays > 0:
+        results['empty_space_skip'] = compare_empty_space_skip(args.skip_rays)
+
+    if args.queries > 0:
+        results['queries_per_second'] = measure_queries(args.queries)
+
+    if args.batch > 0:
+        results['batch_rendering'] = measure_batch_rendering(args.batch, *args.batch_resolution)
+
+    if args.workers > 0:
+        results['worker_scaling'] = run_worker_scaling(screen, args.paths, args.frames, args.workers,
+                                                       world_entities)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    pygame.quit()
+    if args.floor_budget_ms is not None and 'floor_pass' in results and \
+       results['floor_pass']['added_ms'] > args.floor_budget_ms:
+        raise SystemExit(f"Textured floor/ceiling adds {results['floor_pass']['added_ms']:.2f} ms per frame, "
+                         f"over the {args.floor_budget_ms} ms budget")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Camera tables and camera-plane ray generation.
+
+The camera looks along its view direction and carries a camera plane perpendicular to it,
+reaching tan(FOV / 2) to either side. The ray of screen column c goes through a point of
+that plane:
+
+    camera_x = 2 * c / num_rays - 1            # -1 at the left edge, 0 in the middle
+    ray      = view direction + camera_x * tan(FOV / 2) * plane direction
+
+Everything about this fan that does not depend on the camera pose is built once per
+(resolution, FOV) by tables(): the rays of a camera facing +x, (1, slope) for every column,
+and the floor distance of every screen row. A frame's rays are that table turned by the
+player's angle, one 2x2 rotation with no trigonometry per ray. Every ray has a forward
+component of exactly 1, so the DDA's distance along it already is the perpendicular distance
+the walls are drawn at and there is no fisheye to correct.
+
+set_fov() and set_resolution() change the settings while the game runs; the tables follow
+on their next use.
+"""
+import math
+from collections import namedtuple
+
+import numpy as np
+
+import config
+
+# Pose-independent tables of one (num_rays, screen_height, fov):
+#   column_slope     - lateral offset of each column's ray per unit forward, camera_x * tan(fov / 2)
+#   directions       - (2, num_rays) rays of a camera facing +x, [1, column_slope]
+#   row_distance     - float32 distance, along the view direction, of the floor seen in screen
+#                      row screen_height // 2 + i; the ceiling row mirrored about the horizon
+#                      sees the same distance
+#   plane_half_width - tan(fov / 2)
+CameraTables = namedtuple('CameraTables', ['column_slope', 'directions', 'row_distance', 'plane_half_width'])
+
+# CameraTables by (num_rays, screen_height, fov), see tables
+_tables = {}
+_MAX_TABLES = 8 # Batched renders at other sizes must not evict the game's tables every frame
+
+def column_slopes(num_rays, fov):
+    """Returns the camera-plane slope of each of `num_rays` columns for the field of view `fov`.
+
+    `fov` may be an array, e.g. (cameras, 1) for cameras with different fields of view; the
+    result broadcasts it against the columns.
+    """
+    camera_x = 2 * np.arange(num_rays) / num_rays - 1
+    return camera_x * np.tan(np.asarray(fov, dtype=np.float64) / 2)
+
+def tables(num_rays=None, screen_height=None, fov=None):
+    """Returns the CameraTables of a resolution and field of view, by default the current
+    config.NUM_RAYS, SCREEN_HEIGHT and FOV. They are built on first use and kept until the
+    settings change."""
+    if num_rays is None:
+        num_rays = config.NUM_RAYS
+    if screen_height is None:
+        screen_height = config.SCREEN_HEIGHT
+    if fov is None:
+        fov = config.FOV
+    key = (num_rays, screen_height, fov)
+    camera_tables = _tables.get(key)
+    if camera_tables is None:
+        column_slope = column_slopes(num_rays, fov)
+        directions = np.stack([np.ones(num_rays), column_slope])
+        # Same projection as the walls: a wall at distance d reaches down to row H/2 + H/(2d)
+        rows = np.arange(screen_height // 2, screen_height) + 0.5 # Row centres
+        row_distance = ((screen_height / 2) / (rows - screen_height / 2)).astype(np.float32)
+        if len(_tables) >= _MAX_TABLES:
+            _tables.clear()
+        camera_tables = _tables[key] = CameraTables(column_slope, directions, row_distance, math.tan(fov / 2))
+    return camera_tables
+
+def ray_directions(player_angle, columns=None):
+    """Returns the (ray_dir_x, ray_dir_y) arrays of the current camera's rays at `player_angle`.
+
+    `columns` optionally picks some of the ray columns (indices or a slice). The directions
+    are not unit length: their component along the view direction is 1.
+    """
+    directions = tables().directions
+    if columns is not None:
+        directions = directions[:, columns]
+    cos_a, sin_a = math.cos(player_angle), math.sin(player_angle)
+    rotation = np.array([[cos_a, -sin_a],
+                         [sin_a, cos_a]])
+    ray_dir_x, ray_dir_y = rotation @ directions
+    return ray_dir_x, ray_dir_y
+
+def rotate(angle, slope):
+    """Returns the (ray_dir_x, ray_dir_y) of rays with camera-plane `slope` from cameras facing
+    `angle`, broadcasting the two; ray_directions() is the same for the current camera."""
+    cos_a, sin_a = np.cos(angle), np.sin(angle)
+    return cos_a - slope * sin_a, sin_a + slope * cos_a
+
+def screen_columns(depth, lateral, num_rays=None, fov=None):
+    """Returns the ray column, as a float, that a point `depth` ahead of the camera and
+    `lateral` to its right (the plane direction) projects to: the inverse of the ray table."""
+    if num_rays is None:
+        num_rays = config.NUM_RAYS
+    if fov is None:
+        fov = config.FOV
+    return (lateral / (depth * math.tan(fov / 2)) + 1) * (num_rays / 2)
+
+def set_fov(fov):
+    """Changes the field of view, clamped to config.FOV_RANGE, and returns the new value."""
+    low, high = config.FOV_RANGE
+    config.FOV = min(max(fov, low), high)
+    return config.FOV
+
+def set_resolution(width, height, num_rays=None):
+    """Changes the screen size, casting `num_rays` rays (default one per config.STRIP_WIDTH
+    pixels). Call graphics.init_screen() afterwards to resize the window."""
+    if num_rays is None:
+        num_rays = width // config.STRIP_WIDTH
+    config.SCREEN_WIDTH, config.SCREEN_HEIGHT, config.NUM_RAYS = width, height, num_rays
@@ -0,0 +1,101 @@
+"""Capturing rendered frames to a raw video file without stalling the game loop.
+
+FrameCapture keeps a ring of preallocated frame buffers. capture() copies the screen's
+pixels into a free buffer, which is a plain memory copy, and hands it to a background
+thread that writes it to disk. When the writer falls behind and no buffer is free, the frame
+is dropped and counted instead of waiting for the disk.
+
+Frames are written as they are in the screen's memory, 32 bits per pixel, one after another.
+close() prints the ffmpeg command that turns the file into a video, at the rate the frames
+were actually captured so that the video keeps the session's timing.
+"""
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+import pygame
+
+import config
+
+def ffmpeg_pixel_format(surface):
+    """Returns ffmpeg's name for the layout of a 32-bit Surface's pixels in memory, e.g. 'bgr0'."""
+    masks = surface.get_masks()
+    channel_bytes = []
+    for byte in range(4):
+        shift = 8 * byte if sys.byteorder == 'little' else 8 * (3 - byte)
+        names = [name for name, mask in zip('rgba', masks) if mask == 0xFF << shift]
+        channel_bytes.append(names[0] if names else '0')
+    return ''.join(channel_bytes).replace('a', '0')
+
+class FrameCapture:
+    """Streams frames of `size` (width, height) to the raw video file `path`."""
+
+    def __init__(self, path, size, ring_frames=None):
+        if ring_frames is None:
+            ring_frames = config.CAPTURE_RING_FRAMES
+        self.path = path
+        self.size = tuple(size)
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.pixel_format = None
+        self._first_time = self._last_time = None # perf_counter() of the first and last queued frame
+        width, height = self.size
+        self._ring = np.empty((ring_frames, height, width), dtype=np.uint32)
+        self._free = queue.Queue()
+        self._filled = queue.Queue()
+        for slot in range(ring_frames):
+            self._free.put(slot)
+        self._file = open(path, 'wb')
+        self._writer = threading.Thread(target=self._write_frames, name='frame-capture', daemon=True)
+        self._writer.start()
+
+    def capture(self, screen):
+        """Queues the current contents of `screen` (a 32-bit Surface of the capture size) for writing.
+
+        Returns False if the frame was dropped because every buffer is still waiting for the disk.
+        """
+        try:
+            slot = self._free.get_nowait()
+        except queue.Empty:
+            self.frames_dropped += 1
+            return False
+        if self.pixel_format is None:
+            self.pixel_format = ffmpeg_pixel_format(screen)
+        pixels = pygame.surfarray.pixels2d(screen)
+        self._ring[slot] = pixels.T # Row-major like the Surface, so this is a straight copy
+        del pixels # Unlock the surface
+        self._filled.put(slot)
+        self._last_time = time.perf_counter()
+        if self._first_time is None:
+            self._first_time = self._last_time
+        return True
+
+    def frame_rate(self):
+        """Returns the rate frames were captured at, or config.FPS before two were captured."""
+        if self.frames_written < 2 or self._last_time <= self._first_time:
+            return config.FPS
+        # n frames span n - 1 intervals between the first and last capture
+        return (self.frames_written - 1) / (self._last_time - self._first_time)
+
+    def _write_frames(self):
+        while True:
+            slot = self._filled.get()
+            if slot is None:
+                break
+            self._file.write(self._ring[slot].data) # File writes release the GIL
+            self.frames_written += 1
+            self._free.put(slot)
+
+    def close(self):
+        """Writes the frames still queued, closes the file and prints a summary."""
+        if self._file.closed:
+            return
+        self._filled.put(None)
+        self._writer.join()
+        self._file.close()
+        width, height = self.size
+        print(f"Captured {self.frames_written} frames to '{self.path}' ({self.frames_dropped} dropped). "
+              f"To encode: ffmpeg -f rawvideo -pix_fmt {self.pixel_format or 'bgr0'} -s {width}x{height} "
+              f"-r {self.frame_rate():.3f} -i {self.path} capture.mp4")
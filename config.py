@@ -4,22 +4,45 @@ import math
 # Screen dimensions
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
-FPS = 60
+FPS = 60 # Frame rate cap
+# While the camera stands still, reuse the last rendered view and only redraw and push the
+# weapon and overlay rects (pygame.display.update) instead of rendering and flipping everything
+REUSE_STATIC_FRAMES = True
+TICK_RATE = 60 # Simulation ticks per second (see simulation.py), independent of the frame rate
+MAX_TICKS_PER_FRAME = 5 # After a stall, the simulation skips ahead instead of running more ticks
 
 # Player initial settings
 PLAYER_INITIAL_X = 3.5  # Initial x position (in grid units)
 PLAYER_INITIAL_Y = 3.5  # Initial y position (in grid units)
 PLAYER_INITIAL_ANGLE = math.pi / 4  # Initial viewing angle (radians)
 FOV = math.pi / 3  # Field of View (e.g., 60 degrees)
-MOVE_SPEED = 0.05 # Grid units per frame (adjust for faster/slower movement)
-ROT_SPEED = 0.03  # Radians per frame (adjust for faster/slower rotation)
+# Changing the view at runtime (see camera.py): -/= narrow/widen the field of view, F6 steps
+# through the resolutions
+FOV_STEP = math.radians(5)
+FOV_RANGE = (math.radians(30), math.radians(120)) # Narrowest and widest field of view
+RESOLUTIONS = [(800, 600), (640, 480), (400, 300), (1024, 768)]
+MOVE_SPEED = 0.05 # Grid units per tick (adjust for faster/slower movement)
+ROT_SPEED = 0.03  # Radians per tick (adjust for faster/slower rotation)
 STRAFE_ANGLE = math.pi / 2 # 90 degrees for strafing
 
+# Map settings
+MAP_PATH = None # Binary map file to load at startup (see map.py); None uses MAP_DATA
+MAP_SKIP_MIN_SIZE = 64 # Maps at least this wide or tall get a clearance field for empty-space skipping
+MAP_MAX_CLEARANCE = 32 # Largest skip radius (in cells) stored in the clearance field
+
 # Raycasting settings
 # NUM_RAYS can be SCREEN_WIDTH for 1-pixel wide strips, or less for wider strips.
 # Using SCREEN_WIDTH // 2 means each vertical strip will be 2 pixels wide.
 NUM_RAYS = SCREEN_WIDTH # Cast one ray per screen column
 STRIP_WIDTH = 1 # Each strip is 1 pixel wide
+# 'columns' runs the DDA for every ray; 'spans' only casts where the wall face changes and fills
+# the columns in between analytically (see raycaster.cast_spans). Both draw the same pixels.
+RAYCAST_MODE = 'columns'
+SPAN_SAMPLE_SPACING = 16 # Rays between the first rays cast in 'spans' mode
+
+# Parallel rendering (see parallel.py). 0 renders in the main process.
+RENDER_WORKERS = 0 # Number of worker processes rendering column bands
+RENDER_BANDS_PER_WORKER = 2 # Column bands per worker per frame, for load balancing
 
 # Colors
 CEILING_COLOR = (30, 30, 70)   # Dark blueish
@@ -28,10 +51,53 @@ BASE_WALL_COLOR = (139, 69, 19) # A brownish color (SaddleBrown)
 # Shaded color for walls facing North/South to give a sense of depth
 SHADED_WALL_COLOR = tuple(int(c * 0.7) for c in BASE_WALL_COLOR)
 
+# Indexed-color rendering (see palette.py): the floor, ceiling and walls are drawn into an 8-bit
+# framebuffer, with the textures quantized to one palette and shaded through a lookup table
+# that adds distance fog. Sprites and the weapon are drawn in full color on top. Only the
+# single-process renderer draws indexed; parallel.py workers draw in full color.
+INDEXED_COLOR = False
+PALETTE_SIZE = 256
+FOG_LEVELS = 32 # Shade levels per wall side
+FOG_COLOR = (0, 0, 0)
+FOG_DISTANCE = 12.0 # Distance at which everything has faded to FOG_COLOR; None for no fog
+
+# Asset Loading Settings
+ASSET_CACHE_DIR = ".asset_cache" # Decoded, pre-processed assets (see assetcache.py); None disables the cache
+ASSET_LOAD_THREADS = 4 # Threads decoding assets that are not in the cache yet
+
 # Texture Settings
 WALL_TEXTURE_PATH = "assets/textures/stonewall.png"
 WALL_TEXTURE_DARKEN_FACTOR = 0.7 # How much to darken textures on 'shaded' sides
 
+# Wall Atlas Settings
+# Wall type 1 (and any type not listed below) uses WALL_TEXTURE_PATH.
+WALL_ATLAS_PATH = "assets/textures/walls.png"
+WALL_ATLAS_TILE_SIZE = 64
+WALL_ATLAS_ORIGIN = (1, 16) # Top-left pixel of tile (0, 0)
+WALL_ATLAS_SPACING = 1 # Pixels between neighbouring tiles
+WALL_TYPE_ATLAS_TILES = { # Map wall value -> (column, row) of its atlas tile
+    2: (0, 4), # Red brick
+    3: (6, 2), # Wood panelling
+    4: (6, 1), # Blue stone
+    5: (6, 5), # Mossy stone
+}
+
+# Floor/Ceiling Texture Settings: (column, row) tiles of WALL_ATLAS_PATH, or None for the flat
+# FLOOR_COLOR/CEILING_COLOR. With both None the background is drawn as two plain fills.
+FLOOR_ATLAS_TILE = (1, 0) # Grey stone
+CEILING_ATLAS_TILE = (6, 7) # Metal panels
+
+# Entity Sprite Settings
+SPRITE_SHEET_PATH = "assets/sprites/guard.png"
+SPRITE_FRAME_SIZE = 64
+SPRITE_SHEET_SPACING = 1 # Pixels between neighbouring frames
+SPRITE_FRAMES = [(0, 0)] # (column, row) of each sprite in the sheet; an entity's sprite indexes this list
+SPRITE_COLORKEY = (152, 0, 136) # Transparent color of the sprite sheet
+SPRITE_NEAR_PLANE = 0.2 # Entities closer than this (in grid units, along the view) are not drawn
+SPRITE_MAX_DRAWN = 256 # Most sprites drawn per frame after culling; the nearest ones win
+ENTITY_HIT_RADIUS = 0.3 # Shots passing this close to an entity's centre hit it (see queries.hitscan)
+ENTITY_SPAWNS = [(6.5, 3.5), (10.5, 6.5), (13.5, 8.5), (1.5, 8.5)] # Guards placed in MAP_DATA
+
 # Weapon Settings
 PISTOL_IDLE_IMAGE_PATH = "assets/sprites/pistol_idle.png"
 PISTOL_SCALE_FACTOR = 4.0  # Adjust to fit your sprite size
@@ -46,3 +112,17 @@ PISTOL_FIRE_FRAME_PATHS = [
     "assets/sprites/pistol_fire4.png"
 ]
 PISTOL_FIRE_ANIMATION_SPEED_MS = 75 # Milliseconds each frame is displayed
+
+# Input Recording and Frame Capture Settings
+RECORD_INPUT_PATH = None # Write every tick's input here (see replay.py); main.py --record
+REPLAY_INPUT_PATH = None # Play back a recording instead of live input; main.py --replay
+CAPTURE_PATH = None # Stream rendered frames to this raw video file (see capture.py); main.py --capture
+CAPTURE_RING_FRAMES = 32 # Frame buffers between the game loop and the capture writer thread
+
+# Profiler Settings
+PROFILER_ENABLED = False # Start with stage timing and the overlay on (F3 toggles, F4 exports a trace)
+PROFILER_CAPACITY = 3600 # Frames kept in the ring buffer (one minute at 60 FPS)
+PROFILER_OVERLAY_FRAMES = 60 # Frames averaged for the on-screen overlay
+PROFILER_FONT_SIZE = 20
+PROFILER_TEXT_COLOR = (255, 255, 0)
+PROFILER_TRACE_PATH = "frame_trace.json" # Chrome trace-event JSON, open in chrome://tracing or Perfetto
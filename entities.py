@@ -0,0 +1,157 @@
+"""Entities and billboard sprite rendering.
+
+Entity positions live in flat NumPy arrays, so projecting, culling and sorting thousands of
+them is a handful of array operations per frame. Only the sprites that survive culling are
+drawn, each one column-by-column against the wall pass's depth buffer.
+"""
+import math
+
+import numpy as np
+import pygame
+
+import camera
+import config
+import graphics
+import map as game_map
+
+class Entities:
+    """Positions and sprite indices of all entities, as parallel arrays."""
+
+    def __init__(self):
+        self.x = np.zeros(0)
+        self.y = np.zeros(0)
+        self.sprite = np.zeros(0, dtype=np.intp) # Index into config.SPRITE_FRAMES
+
+    def __len__(self):
+        return self.x.size
+
+    def add(self, x, y, sprite=0):
+        """Adds one entity, or many when x and y are arrays. Returns the new entities' indices."""
+        x = np.atleast_1d(np.asarray(x, dtype=np.float64))
+        y = np.atleast_1d(np.asarray(y, dtype=np.float64))
+        sprite = np.broadcast_to(np.asarray(sprite, dtype=np.intp), x.shape)
+        first = self.x.size
+        self.x = np.concatenate([self.x, x])
+        self.y = np.concatenate([self.y, y])
+        self.sprite = np.concatenate([self.sprite, sprite])
+        return np.arange(first, self.x.size)
+
+    def remove(self, indices):
+        """Removes the entities at `indices`; later entities move down to fill the gaps."""
+        keep = np.ones(self.x.size, dtype=bool)
+        keep[indices] = False
+        self.x, self.y, self.sprite = self.x[keep], self.y[keep], self.sprite[keep]
+
+    def scatter(self, count, seed=0, sprite=0):
+        """Adds `count` entities at random positions in empty cells of the active map."""
+        rng = np.random.default_rng(seed)
+        free_y, free_x = np.nonzero(game_map.GRID == 0)
+        cells = rng.integers(0, free_x.size, count)
+        return self.add(free_x[cells] + rng.uniform(0.2, 0.8, count),
+                        free_y[cells] + rng.uniform(0.2, 0.8, count), sprite)
+
+def spawn_entities():
+    """Returns the Entities of config.ENTITY_SPAWNS that lie in empty cells of the active map."""
+    world_entities = Entities()
+    for x, y in config.ENTITY_SPAWNS:
+        if 0 <= int(x) < game_map.MAP_WIDTH and 0 <= int(y) < game_map.MAP_HEIGHT and \
+           game_map.GRID[int(y), int(x)] == 0:
+            world_entities.add(x, y)
+    return world_entities
+
+def project(world_entities, player_x, player_y, player_angle):
+    """Projects every entity onto the screen.
+
+    Returns (depth, left, width, height) arrays: depth along the view direction (the same
+    perpendicular distance the walls use), the first ray column the sprite covers as a float,
+    its width in ray columns and its height in screen pixels.
+    """
+    dx = world_entities.x - player_x
+    dy = world_entities.y - player_y
+    cos_a, sin_a = math.cos(player_angle), math.sin(player_angle)
+    depth = dx * cos_a + dy * sin_a
+    lateral = dy * cos_a - dx * sin_a
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Column of the sprite's centre, through the same camera plane as the rays
+        center = camera.screen_columns(depth, lateral)
+        # A sprite is one grid unit wide and one wall high
+        width = config.NUM_RAYS / (2 * camera.tables().plane_half_width * depth)
+        height = config.SCREEN_HEIGHT / depth
+    return depth, center - width / 2, width, height
+
+def cull(depth, left, width, depth_buffer):
+    """Returns indices of the sprites to draw, farthest first.
+
+    Drops sprites behind the near plane, off screen, or hidden behind walls in every column
+    they cover, then keeps the nearest config.SPRITE_MAX_DRAWN of the rest.
+    """
+    num_rays = depth_buffer.size
+    first = np.ceil(left)
+    last = np.ceil(left + width)
+    candidates = np.flatnonzero((depth > config.SPRITE_NEAR_PLANE) & (last > 0) & (first < num_rays))
+    if candidates.size == 0:
+        return candidates
+    first = np.clip(first[candidates], 0, num_rays - 1).astype(np.intp)
+    last = np.clip(last[candidates], 1, num_rays).astype(np.intp)
+
+    # Farthest wall over each sprite's column span, all spans at once: reduceat over
+    # interleaved (first, last) bounds yields the max of [first, last) at every even slot.
+    padded = np.append(depth_buffer, 0.0)
+    bounds = np.empty(2 * candidates.size, dtype=np.intp)
+    bounds[0::2] = first
+    bounds[1::2] = np.maximum(last, first + 1)
+    farthest_wall = np.maximum.reduceat(padded, bounds)[0::2]
+    candidates = candidates[depth[candidates] < farthest_wall]
+
+    candidates = candidates[np.argsort(depth[candidates], kind='stable')][:config.SPRITE_MAX_DRAWN]
+    return candidates[::-1]
+
+def write_sprite_pixels(pixels, world_entities, player_x, player_y, player_angle, depth_buffer,
+                        sprite_columns, sprite_opaque):
+    """Draws the visible sprites into `pixels`, a (width, height) array of mapped colors.
+
+    `depth_buffer` holds the wall distance of every ray column (inf where no wall was hit).
+    `sprite_columns` and `sprite_opaque` are (sprites, width, height) arrays of mapped colors
+    and of the pixels that are not transparent.
+    """
+    if len(world_entities) == 0:
+        return
+    depth, left, width, height = project(world_entities, player_x, player_y, player_angle)
+    screen_height = config.SCREEN_HEIGHT
+    sprite_width, sprite_height = sprite_columns.shape[1:]
+
+    # Painter's order: far sprites first, so nearer ones overwrite them
+    for index in cull(depth, left, width, depth_buffer).tolist():
+        first = max(0, math.ceil(left[index]))
+        last = min(depth_buffer.size, math.ceil(left[index] + width[index]))
+        top = screen_height / 2 - height[index] / 2
+        first_row = max(0, math.ceil(top))
+        last_row = min(screen_height, math.ceil(top + height[index]))
+        in_front = depth_buffer[first:last] > depth[index] # Columns not hidden behind a wall
+        if last_row <= first_row or not in_front.any():
+            continue
+
+        tex_x = ((np.arange(first, last) - left[index]) * sprite_width / width[index]).astype(np.intp)
+        tex_y = ((np.arange(first_row, last_row) - top) * sprite_height / height[index]).astype(np.intp)
+        tex_x = np.minimum(tex_x, sprite_width - 1)[:, None]
+        tex_y = np.minimum(tex_y, sprite_height - 1)
+
+        sprite = world_entities.sprite[index]
+        texels = sprite_columns[sprite][tex_x, tex_y]
+        visible = sprite_opaque[sprite][tex_x, tex_y] & in_front[:, None]
+        for offset in range(config.STRIP_WIDTH):
+            region = pixels[first * config.STRIP_WIDTH + offset:last * config.STRIP_WIDTH:config.STRIP_WIDTH,
+                            first_row:last_row]
+            np.copyto(region, texels, where=visible, casting='unsafe')
+
+def draw_sprites(screen, world_entities, player_x, player_y, player_angle, depth_buffer):
+    """Draws the entities' billboard sprites onto `screen`, hidden where walls are nearer."""
+    if len(world_entities) == 0:
+        return # Without entities the sprite sheet is never loaded
+    if graphics.game_assets.get('sprite_columns') is None:
+        return # Sprite sheet failed to load
+    pixels = pygame.surfarray.pixels2d(screen)
+    write_sprite_pixels(pixels, world_entities, player_x, player_y, player_angle, depth_buffer,
+                        graphics.mapped_columns(screen, 'sprite_columns'), graphics.game_assets['sprite_opaque'])
+    del pixels # Unlock the surface
@@ -1,27 +1,56 @@
+import math
+
+import numpy as np
 import pygame
+import assetcache
+import camera
 import config
+import palette
+
+class LazyAssets(dict):
+    """A dict whose entries can be loaded on first access.
+
+    set_lazy(name, resolve) registers a function that returns the value; the first
+    game_assets[name] or game_assets.get(name) calls it and stores the result.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._pending = {}
+
+    def set_lazy(self, name, resolve):
+        self.pop(name, None)
+        self._pending[name] = resolve
+
+    def _resolve(self, name):
+        resolve = self._pending.pop(name, None)
+        if resolve is not None:
+            super().__setitem__(name, resolve())
+
+    def __setitem__(self, name, value):
+        self._pending.pop(name, None)
+        super().__setitem__(name, value)
+
+    def __getitem__(self, name):
+        self._resolve(name)
+        return super().__getitem__(name)
+
+    def get(self, name, default=None):
+        self._resolve(name)
+        return super().get(name, default)
+
+    def __contains__(self, name):
+        return name in self._pending or super().__contains__(name)
 
 # Dictionary to hold loaded game assets
-game_assets = {}
+game_assets = LazyAssets()
+
+_floor_packed = None # (floor_columns, shade_table, packed copy), see _packed_floor_columns
+_indexed_framebuffer = None # (palette, 8-bit Surface), see view_surface
 
 def load_image(path, scale_factor=1.0, use_alpha=True, colorkey=None):
     """Loads an image, scales it, and converts it for Pygame."""
-    try:
-        image = pygame.image.load(path)
-        size = image.get_size()
-        scaled_size = (int(size[0] * scale_factor), int(size[1] * scale_factor))
-        image = pygame.transform.scale(image, scaled_size)
-
-        if use_alpha:
-            image = image.convert_alpha()
-        else:
-            image = image.convert() # Convert first for non-alpha images
-            if colorkey is not None: # Apply colorkey after conversion
-                image.set_colorkey(colorkey)
-        return image
-    except pygame.error as e:
-        print(f"Error loading image {path}: {e}")
-        return None # Or raise an error, or return a placeholder surface
+    return _resolve_image(_submit_image(path, scale_factor, use_alpha), path, use_alpha, colorkey)
 
 def load_spritesheet(path, frame_width, frame_height, num_frames, scale_factor=1.0, use_alpha=True):
     """Loads a horizontal spritesheet, extracts frames, scales them, and converts them."""
@@ -46,43 +75,209 @@ def load_spritesheet(path, frame_width, frame_height, num_frames, scale_factor=1
 
 def load_animation_frames(frame_paths, scale_factor=1.0, use_alpha=True, colorkey=None):
     """Loads a sequence of images from a list of paths to be used as animation frames."""
+    # Start them all first so the ones missing from the asset cache decode in parallel
+    loads = [_submit_image(path, scale_factor, use_alpha) for path in frame_paths]
     frames = []
-    for path in frame_paths:
-        image = load_image(path, scale_factor, use_alpha, colorkey)
+    for path, image_load in zip(frame_paths, loads):
+        image = _resolve_image(image_load, path, use_alpha, colorkey)
         if image:
             frames.append(image)
-        # If an image fails to load, load_image already prints an error.
+        # If an image fails to load, _resolve_image already prints an error.
     return frames
 
+def _decode_image(path, scale_factor=1.0, use_alpha=True):
+    """Loads and scales an image file into a (height, width, 3 or 4) RGB(A) uint8 array.
+
+    Doesn't need the display, so it can run on an asset loader thread.
+    """
+    image = pygame.image.load(path)
+    size = image.get_size()
+    scaled_size = (int(size[0] * scale_factor), int(size[1] * scale_factor))
+    image = pygame.transform.scale(image, scaled_size)
+    pixel_format = 'RGBA' if use_alpha else 'RGB'
+    pixels = np.frombuffer(pygame.image.tobytes(image, pixel_format), dtype=np.uint8)
+    return pixels.reshape(scaled_size[1], scaled_size[0], len(pixel_format))
+
+def _submit_image(path, scale_factor=1.0, use_alpha=True):
+    """Starts loading an image through the asset cache; returns a Future of its _decode_image array."""
+    name = 'image_' + path.replace('/', '_').replace('.', '_')
+    return assetcache.submit(name, [path], (scale_factor, use_alpha),
+                             lambda: _decode_image(path, scale_factor, use_alpha))
+
+def _resolve_image(image_load, path, use_alpha=True, colorkey=None):
+    """Waits for an image started by _submit_image and converts it for Pygame (None on errors)."""
+    try:
+        pixels = image_load.result()
+    except pygame.error as e:
+        print(f"Error loading image {path}: {e}")
+        return None # Or raise an error, or return a placeholder surface
+    height, width, channels = pixels.shape
+    image = pygame.image.frombuffer(np.ascontiguousarray(pixels), (width, height), 'RGBA' if channels == 4 else 'RGB')
+
+    if use_alpha:
+        image = image.convert_alpha()
+    else:
+        image = image.convert() # Convert first for non-alpha images
+        if colorkey is not None: # Apply colorkey after conversion
+            image.set_colorkey(colorkey)
+    return image
+
 def load_all_assets():
-    """Loads all game assets like textures and sprites."""
+    """Loads all game assets like textures and sprites.
+
+    Everything goes through the on-disk asset cache (assetcache.py), and the loads all start
+    on its thread pool before any of them is waited for. Assets that are not needed to draw
+    the first frame (the standalone wall texture Surface, entity sprites, pistol fire frames)
+    are left loading in the background and only waited for on first access.
+    """
+    global game_assets
+
+    sprite_sheet_load = assetcache.submit(
+        'sprite_sheet', [config.SPRITE_SHEET_PATH],
+        (config.SPRITE_FRAMES, config.SPRITE_FRAME_SIZE, config.SPRITE_SHEET_SPACING),
+        lambda: _decode_atlas_tiles(config.SPRITE_SHEET_PATH, config.SPRITE_FRAMES, config.SPRITE_FRAME_SIZE,
+                                    (0, 0), config.SPRITE_SHEET_SPACING))
+    pistol_idle_load = _submit_image(config.PISTOL_IDLE_IMAGE_PATH, config.PISTOL_SCALE_FACTOR, use_alpha=False)
+    pistol_fire_loads = [_submit_image(path, config.PISTOL_SCALE_FACTOR, use_alpha=False)
+                         for path in config.PISTOL_FIRE_FRAME_PATHS]
+    load_textures() # Waits for the textures; the loads above keep going meanwhile
+
+    # Load Entity Sprites: RGB columns plus a mask of the pixels that are not SPRITE_COLORKEY
+    def resolve_sprite_columns():
+        try:
+            sprite_columns = sprite_sheet_load.result()
+        except (pygame.error, ValueError) as e:
+            print(f"Error loading atlas {config.SPRITE_SHEET_PATH}: {e}")
+            print(f"ERROR: Failed to load sprite sheet: {config.SPRITE_SHEET_PATH}")
+            return None
+        print(f"Sprite sheet '{config.SPRITE_SHEET_PATH}' loaded ({len(sprite_columns)} frames).")
+        return sprite_columns
+    game_assets.set_lazy('sprite_columns', resolve_sprite_columns)
+    game_assets.set_lazy('sprite_opaque', lambda: None if game_assets['sprite_columns'] is None else
+                         (game_assets['sprite_columns'] != config.SPRITE_COLORKEY).any(axis=-1))
+
+    # Load Weapon Graphics
+    game_assets['pistol_idle'] = _resolve_image(
+        pistol_idle_load,
+        config.PISTOL_IDLE_IMAGE_PATH,
+        use_alpha=False,
+        colorkey=config.PISTOL_COLORKEY
+    )
+    game_assets.set_lazy('pistol_fire_frames', lambda: [
+        frame for frame in (_resolve_image(image_load, path, use_alpha=False, colorkey=config.PISTOL_COLORKEY)
+                            for path, image_load in zip(config.PISTOL_FIRE_FRAME_PATHS, pistol_fire_loads))
+        if frame])
+
+def load_textures():
+    """Loads the wall, floor and ceiling textures into game_assets as RGB column arrays.
+
+    Unlike load_all_assets this needs no display, so it is all that headless renderers
+    (observations.py) load.
+    """
     global game_assets
+    game_assets.pop('mapped_columns', None) # Mapped copies of the previous textures
 
-    # Load Wall Texture
-    game_assets['wall_texture'] = load_image(config.WALL_TEXTURE_PATH, scale_factor=1.0, use_alpha=False)
-    if game_assets.get('wall_texture'):
-        game_assets['wall_texture_width'] = game_assets['wall_texture'].get_width()
-        game_assets['wall_texture_height'] = game_assets['wall_texture'].get_height()
+    wall_types = list(config.WALL_TYPE_ATLAS_TILES)
+    wall_texture_load = assetcache.submit(
+        'wall_texture', [config.WALL_TEXTURE_PATH], config.WALL_TEXTURE_DARKEN_FACTOR,
+        lambda: _shade_columns(pygame.surfarray.array3d(pygame.image.load(config.WALL_TEXTURE_PATH))[None]))
+    wall_atlas_load = assetcache.submit(
+        'wall_atlas', [config.WALL_ATLAS_PATH],
+        (list(config.WALL_TYPE_ATLAS_TILES.values()), config.WALL_ATLAS_TILE_SIZE, config.WALL_ATLAS_ORIGIN,
+         config.WALL_ATLAS_SPACING, config.WALL_TEXTURE_DARKEN_FACTOR),
+        lambda: _shade_columns(_decode_atlas_tiles(config.WALL_ATLAS_PATH, list(config.WALL_TYPE_ATLAS_TILES.values()),
+                                                   config.WALL_ATLAS_TILE_SIZE, config.WALL_ATLAS_ORIGIN,
+                                                   config.WALL_ATLAS_SPACING)))
+    floor_tiles = [config.FLOOR_ATLAS_TILE, config.CEILING_ATLAS_TILE]
+    atlas_floor_tiles = [tile for tile in floor_tiles if tile is not None]
+    floor_load = None
+    if atlas_floor_tiles:
+        floor_load = assetcache.submit(
+            'floor_textures', [config.WALL_ATLAS_PATH],
+            (atlas_floor_tiles, config.WALL_ATLAS_TILE_SIZE, config.WALL_ATLAS_ORIGIN, config.WALL_ATLAS_SPACING),
+            lambda: _decode_atlas_tiles(config.WALL_ATLAS_PATH, atlas_floor_tiles, config.WALL_ATLAS_TILE_SIZE,
+                                        config.WALL_ATLAS_ORIGIN, config.WALL_ATLAS_SPACING))
+
+    # Load Wall Textures: texture 0 is WALL_TEXTURE_PATH, then the atlas tiles of WALL_TYPE_ATLAS_TILES
+    try:
+        wall_columns = wall_texture_load.result() # (lit/shaded, 1, width, height, RGB)
+    except pygame.error as e:
+        wall_columns = None
+        print(f"Error loading image {config.WALL_TEXTURE_PATH}: {e}")
+    if wall_columns is not None:
+        game_assets['wall_texture_width'], game_assets['wall_texture_height'] = wall_columns.shape[2:4]
+        game_assets.set_lazy('wall_texture', lambda: pygame.surfarray.make_surface(wall_columns[0, 0]).convert())
         print(f"Wall texture '{config.WALL_TEXTURE_PATH}' loaded ({game_assets['wall_texture_width']}x{game_assets['wall_texture_height']}).")
     else:
+        game_assets['wall_texture'] = None
         print(f"ERROR: Failed to load wall texture: {config.WALL_TEXTURE_PATH}")
         # Consider setting default dimensions or a placeholder texture if loading fails
         game_assets['wall_texture_width'] = 64 # Default fallback
         game_assets['wall_texture_height'] = 64 # Default fallback
 
-    # Load Weapon Graphics
-    game_assets['pistol_idle'] = load_image(
-        config.PISTOL_IDLE_IMAGE_PATH,
-        config.PISTOL_SCALE_FACTOR,
-        use_alpha=False,
-        colorkey=config.PISTOL_COLORKEY
-    )
-    game_assets['pistol_fire_frames'] = load_animation_frames(
-        config.PISTOL_FIRE_FRAME_PATHS,
-        scale_factor=config.PISTOL_SCALE_FACTOR,
-        use_alpha=False,
-        colorkey=config.PISTOL_COLORKEY
-    )
+    # Wall value -> texture index lookup; wall types without a loaded texture use texture 0
+    wall_texture_ids = np.zeros(256, dtype=np.intp)
+    if wall_columns is not None:
+        try:
+            atlas_columns = wall_atlas_load.result()
+        except (pygame.error, ValueError) as e: # ValueError: tile rect outside the atlas
+            atlas_columns = None
+            print(f"Error loading atlas {config.WALL_ATLAS_PATH}: {e}")
+        if atlas_columns is not None and len(wall_types) > 0:
+            wall_texture_ids[wall_types] = np.arange(1, len(wall_types) + 1)
+            wall_columns = np.concatenate([wall_columns, _resize_columns(atlas_columns, wall_columns.shape[2:4])],
+                                          axis=1)
+            print(f"Wall atlas '{config.WALL_ATLAS_PATH}' loaded ({len(wall_types)} wall types).")
+        game_assets['wall_columns'] = np.ascontiguousarray(wall_columns)
+    game_assets['wall_texture_ids'] = wall_texture_ids
+
+    # Load Floor/Ceiling Textures: [0] floor, [1] ceiling; a plane without an atlas tile gets
+    # a texture of its flat color
+    game_assets['floor_columns'] = None
+    if floor_load is not None:
+        try:
+            atlas_columns = iter(floor_load.result())
+        except (pygame.error, ValueError) as e:
+            print(f"Error loading atlas {config.WALL_ATLAS_PATH}: {e}")
+        else:
+            tile_size = config.WALL_ATLAS_TILE_SIZE
+            game_assets['floor_columns'] = np.stack([
+                next(atlas_columns) if tile is not None else np.full((tile_size, tile_size, 3), color, dtype=np.uint8)
+                for tile, color in zip(floor_tiles, (config.FLOOR_COLOR, config.CEILING_COLOR))])
+            print(f"Floor and ceiling textures loaded from '{config.WALL_ATLAS_PATH}'.")
+
+    if config.INDEXED_COLOR:
+        load_indexed_textures()
+
+def load_indexed_textures():
+    """Quantizes the loaded textures to one palette for the indexed-color path (see palette.py).
+
+    Sets game_assets 'palette' (colors, 3), 'shade_table', and the palette-index versions of
+    the textures: 'wall_indices' (1, textures, width, height), lit only since the shade table
+    darkens Y sides, and 'floor_indices' (2, width, height).
+    """
+    wall_columns = game_assets.get('wall_columns')
+    floor_columns = game_assets.get('floor_columns')
+    colors = [np.array([config.BASE_WALL_COLOR, config.SHADED_WALL_COLOR, config.FLOOR_COLOR, config.CEILING_COLOR],
+                       dtype=np.uint8)]
+    if wall_columns is not None:
+        colors.append(wall_columns[0].reshape(-1, 3))
+    if floor_columns is not None:
+        colors.append(floor_columns.reshape(-1, 3))
+    colors = np.concatenate(colors)
+
+    # The palette is the slow part; it depends on the same files and settings as the textures
+    params = (sorted(config.WALL_TYPE_ATLAS_TILES.items()), config.WALL_ATLAS_TILE_SIZE, config.WALL_ATLAS_ORIGIN,
+              config.WALL_ATLAS_SPACING, config.FLOOR_ATLAS_TILE, config.CEILING_ATLAS_TILE,
+              [config.BASE_WALL_COLOR, config.SHADED_WALL_COLOR, config.FLOOR_COLOR, config.CEILING_COLOR],
+              config.PALETTE_SIZE, config.FOG_LEVELS, config.FOG_COLOR, config.WALL_TEXTURE_DARKEN_FACTOR)
+    texture_palette = np.asarray(assetcache.load(
+        'palette', [config.WALL_TEXTURE_PATH, config.WALL_ATLAS_PATH], params,
+        lambda: palette.build_palette(colors, config.PALETTE_SIZE)))
+    game_assets['palette'] = texture_palette
+    game_assets['shade_table'] = palette.shade_table(texture_palette)
+    game_assets['wall_indices'] = None if wall_columns is None else palette.nearest_colors(wall_columns[:1], texture_palette)
+    game_assets['floor_indices'] = None if floor_columns is None else palette.nearest_colors(floor_columns, texture_palette)
 
 def init_screen():
     """Initializes the Pygame screen and returns it."""
@@ -94,52 +289,328 @@ def init_screen():
     pygame.display.set_caption("Raycaster Demo - WASD Movement, Arrow Key Rotation")
     return screen
 
+def view_surface(screen):
+    """Returns the Surface to draw the floor, ceiling and walls into: `screen`, or with
+    config.INDEXED_COLOR an 8-bit framebuffer of the same size using the texture palette.
+    present_view() then puts it on the screen."""
+    global _indexed_framebuffer
+    texture_palette = game_assets.get('palette')
+    if not config.INDEXED_COLOR or texture_palette is None:
+        return screen
+    if _indexed_framebuffer is None or _indexed_framebuffer[0] is not texture_palette or \
+       _indexed_framebuffer[1].get_size() != screen.get_size():
+        framebuffer = pygame.Surface(screen.get_size(), 0, 8)
+        framebuffer.set_palette([tuple(color) for color in texture_palette.tolist()])
+        _indexed_framebuffer = (texture_palette, framebuffer)
+    return _indexed_framebuffer[1]
+
+def present_view(screen, view):
+    """Copies a view drawn into view_surface(screen) onto the screen, if it is not the screen."""
+    if view is not screen:
+        screen.blit(view, (0, 0))
+
 def draw_background(screen):
     """Draws the ceiling and floor."""
-    screen.fill(config.CEILING_COLOR)
-    pygame.draw.rect(screen, config.FLOOR_COLOR, (0, config.SCREEN_HEIGHT // 2, config.SCREEN_WIDTH, config.SCREEN_HEIGHT // 2))
-
-def draw_wall_strip(screen, screen_x_pos, draw_start_y, line_height_on_screen,
-                      wall_hit_coord_on_segment, side_hit, ray_dir_x, ray_dir_y):
-    """Draws a single textured vertical wall strip."""
-    wall_texture = game_assets.get('wall_texture')
-    wall_texture_width = game_assets.get('wall_texture_width', 64)
-    wall_texture_height = game_assets.get('wall_texture_height', 64)
-
-    if not wall_texture or line_height_on_screen <= 0:
-        # Fallback to drawing solid color if texture not loaded or strip too small
-        fallback_color = config.SHADED_WALL_COLOR if side_hit == 1 else config.BASE_WALL_COLOR
-        pygame.draw.rect(screen, fallback_color, (screen_x_pos, draw_start_y, config.STRIP_WIDTH, line_height_on_screen))
+    pixels = pygame.surfarray.pixels2d(screen)
+    write_background_pixels(pixels, screen.map_rgb(config.CEILING_COLOR), screen.map_rgb(config.FLOOR_COLOR))
+    del pixels # Unlock the surface
+
+def write_background_pixels(pixels, ceiling_color, floor_color):
+    """Fills `pixels`, a (width, height) array, with the flat ceiling and, below the horizon,
+    the floor, given as mapped colors."""
+    half_height = pixels.shape[1] // 2
+    pixels[:] = ceiling_color
+    pixels[:, half_height:half_height * 2] = floor_color
+
+def draw_floor_and_ceiling(screen, player_x, player_y, player_angle):
+    """Draws the textured floor and ceiling, or the flat background without floor textures.
+
+    On an 8-bit Surface from view_surface the palette-index textures are drawn, fogged.
+    """
+    indexed = screen.get_bitsize() == 8
+    if game_assets.get('floor_indices' if indexed else 'floor_columns') is None:
+        draw_background(screen)
         return
+    drawn_width = config.NUM_RAYS * config.STRIP_WIDTH
+    if drawn_width < config.SCREEN_WIDTH: # Columns right of the last strip
+        screen.fill(config.CEILING_COLOR, (drawn_width, 0, config.SCREEN_WIDTH - drawn_width, config.SCREEN_HEIGHT))
+    pixels = pygame.surfarray.pixels2d(screen)
+    if indexed:
+        write_floor_pixels(pixels, np.arange(config.NUM_RAYS), player_x, player_y, player_angle,
+                           game_assets['floor_indices'], game_assets['shade_table'])
+    else:
+        write_floor_pixels(pixels, np.arange(config.NUM_RAYS), player_x, player_y, player_angle,
+                           mapped_columns(screen, 'floor_columns'))
+    del pixels # Unlock the surface
+
+def write_floor_pixels(pixels, columns, player_x, player_y, player_angle, floor_columns, shade_table=None):
+    """Writes the floor and ceiling strips of ray `columns` into `pixels`, a (width, height) array.
+
+    The first of `columns` lands on the first column of `pixels`. `floor_columns` is the
+    (2, width, height) mapped array of the floor [0] and ceiling [1] textures from
+    mapped_columns, or their palette indices with a `shade_table` (see palette.py).
+    """
+    column_slope = camera.tables(screen_height=pixels.shape[1]).column_slope
+    write_floor_texels(pixels, column_slope[columns], player_x, player_y, player_angle, floor_columns,
+                       shade_table=shade_table)
+
+def write_floor_texels(pixels, slope, player_x, player_y, player_angle, floor_columns, strip_width=None,
+                       shade_table=None):
+    """Writes floor and ceiling into `pixels`, a (width, height) array, for camera-plane `slope`s.
+
+    The camera pose is scalars or one entry per ray. `floor_columns` is (2, width, height):
+    mapped colors, or palette indices with a `shade_table`.
+    """
+    if strip_width is None:
+        strip_width = config.STRIP_WIDTH
+    screen_height = pixels.shape[1]
+    row_distance = camera.tables(screen_height=screen_height).row_distance
+    _, texture_width, texture_height = floor_columns.shape
+    # Texels moved per unit of view distance, for each column's ray
+    ray_dir_x, ray_dir_y = camera.rotate(player_angle, slope)
+    step_x = (ray_dir_x * texture_width).astype(np.float32)
+    step_y = (ray_dir_y * texture_height).astype(np.float32)
+
+    # Texel coordinates relative to the player's texel, shifted by a whole number of textures
+    # big enough to keep them positive: then truncating to int is floor, the wrap below takes
+    # the shift back out, and float32 keeps sub-texel precision anywhere on a large map.
+    reach = math.ceil(float(row_distance[0]) * math.hypot(1.0, float(np.abs(slope).max())) + 1)
+    offset_x = (np.asarray(player_x) * texture_width) % texture_width + reach * texture_width
+    offset_y = (np.asarray(player_y) * texture_height) % texture_height + reach * texture_height
+
+    # Every floor row lies at one distance, so the texel under each pixel is an outer product
+    # of row distances and column steps; (rows, columns) arrays, a Surface's memory order
+    texel_x = np.multiply.outer(row_distance, step_x)
+    texel_x += offset_x.astype(np.float32)
+    texel_y = np.multiply.outer(row_distance, step_y)
+    texel_y += offset_y.astype(np.float32)
+    texel = _wrap(texel_x.astype(np.intp), texture_width) # intp: np.take is much slower with other index types
+    texel *= texture_height
+    texel += _wrap(texel_y.astype(np.intp), texture_height)
+    if shade_table is not None:
+        # The packed textures hold a copy per shade level: fog is an offset per row
+        texel += (palette.fog_levels(row_distance) * (texture_width * texture_height))[:, None]
+
+    # One gather fetches both planes: floor and ceiling texel colors packed side by side
+    both = np.take(_packed_floor_columns(floor_columns, shade_table), texel).view(floor_columns.dtype)
+    both = both.reshape(texel.shape + (2,))
+    rows = pixels.T
+    for offset in range(strip_width):
+        strips = rows[:, offset:slope.size * strip_width:strip_width]
+        strips[screen_height // 2:] = both[..., 0]
+        strips[:screen_height // 2] = both[screen_height // 2 - 1::-1, :, 1] # Mirrored about the horizon
+
+def _packed_floor_columns(floor_columns, shade_table=None):
+    """Returns the floor and ceiling texels of a (2, width, height) array as one flat array
+    with both values of a texel side by side in a single element, cached per input array.
+
+    With a `shade_table` the texels are palette indices, and the result holds the textures at
+    every lit fog level (shade_table rows 0 .. FOG_LEVELS - 1) one after the other.
+    """
+    global _floor_packed
+    if _floor_packed is None or _floor_packed[0] is not floor_columns or _floor_packed[1] is not shade_table:
+        planes = floor_columns.reshape(2, -1)
+        if shade_table is not None:
+            # (levels, 2, texels) -> (2, levels * texels)
+            planes = shade_table[:config.FOG_LEVELS, planes].transpose(1, 0, 2).reshape(2, -1)
+        packed = np.ascontiguousarray(np.stack([planes[0], planes[1]], axis=-1))
+        packed_dtype = np.dtype('u%d' % (2 * floor_columns.dtype.itemsize))
+        _floor_packed = (floor_columns, shade_table, packed.view(packed_dtype).ravel())
+    return _floor_packed[2]
+
+def _wrap(values, size):
+    """values % size in place, as a bit mask when size is a power of two."""
+    if size & (size - 1) == 0:
+        values &= size - 1
+    else:
+        values %= size
+    return values
+
+def _cut_tiles(atlas, tiles, tile_size, origin, spacing):
+    """Returns the (column, row) `tiles` of an atlas Surface as subsurfaces."""
+    return [atlas.subsurface(pygame.Rect(origin[0] + column * (tile_size + spacing),
+                                         origin[1] + row * (tile_size + spacing), tile_size, tile_size))
+            for column, row in tiles]
+
+def _decode_atlas_tiles(path, tiles, tile_size, origin, spacing):
+    """Returns the `tiles` of an atlas image as one (tiles, width, height, 3) RGB array.
+
+    Doesn't need the display, so it can run on an asset loader thread.
+    """
+    atlas = pygame.image.load(path)
+    columns = np.zeros((len(tiles), tile_size, tile_size, 3), dtype=np.uint8)
+    for i, tile in enumerate(_cut_tiles(atlas, tiles, tile_size, origin, spacing)):
+        columns[i] = pygame.surfarray.array3d(tile)
+    return columns
+
+def _shade_columns(columns):
+    """Returns RGB texture columns (textures, width, height, 3) stacked with their shaded copies.
 
-    # Calculate the x-coordinate on the texture
-    tex_x = int(wall_hit_coord_on_segment * wall_texture_width)
+    Index [0] of the result holds the lit textures and [1] the Y-side shaded ones, made with
+    the same alpha blend the old per-strip overlay used. The last axis runs down a texture
+    column, so every strip reads one contiguous run of texels.
+    """
+    width, height = columns.shape[1:3]
+    shade_overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+    shade_overlay.fill((0, 0, 0, int(255 * (1.0 - config.WALL_TEXTURE_DARKEN_FACTOR)))) # Darken
 
-    # Adjust tex_x for texture mirroring based on ray direction (Lodev's conditions)
-    if side_hit == 0 and ray_dir_x > 0:
-        tex_x = wall_texture_width - tex_x - 1
-    if side_hit == 1 and ray_dir_y < 0:
-        tex_x = wall_texture_width - tex_x - 1
-    
-    tex_x = max(0, min(tex_x, wall_texture_width - 1)) # Clamp tex_x
+    shaded = np.empty_like(columns)
+    for i, texture_columns in enumerate(columns):
+        # A plain 32-bit Surface blends exactly like the display-format textures did
+        texture = pygame.Surface((width, height))
+        pygame.surfarray.blit_array(texture, texture_columns)
+        texture.blit(shade_overlay, (0, 0))
+        shaded[i] = pygame.surfarray.array3d(texture)
+    return np.ascontiguousarray(np.stack([columns, shaded]))
 
-    # Get the 1-pixel wide column from the texture
-    texture_column_rect = pygame.Rect(tex_x, 0, 1, wall_texture_height)
-    texture_strip_original = wall_texture.subsurface(texture_column_rect)
+def _resize_columns(columns, size):
+    """Nearest-neighbour resizes (..., width, height, 3) columns like pygame.transform.scale."""
+    width, height = columns.shape[-3:-1]
+    if (width, height) == tuple(size):
+        return columns
+    x = np.arange(size[0]) * width // size[0]
+    y = np.arange(size[1]) * height // size[1]
+    return columns[..., x[:, None], y, :]
 
-    # Scale this strip to the calculated height on screen
-    scaled_texture_strip = pygame.transform.scale(texture_strip_original, (config.STRIP_WIDTH, line_height_on_screen))
+def mapped_columns(surface, name):
+    """Returns the RGB column array game_assets[name] mapped to the pixel format of `surface`.
 
-    # Blit the scaled strip
-    screen.blit(scaled_texture_strip, (screen_x_pos, draw_start_y))
+    The mapped copy is cached per asset and format, so this is a dict lookup after the first call.
+    """
+    key = (surface.get_bitsize(), surface.get_masks())
+    cached = game_assets.setdefault('mapped_columns', {}).get(name)
+    if cached is None or cached[0] != key:
+        columns = game_assets[name]
+        mapped = pygame.surfarray.map_array(surface, columns.reshape(-1, columns.shape[-2], 3))
+        cached = (key, np.ascontiguousarray(mapped.reshape(columns.shape[:-1])))
+        game_assets['mapped_columns'][name] = cached
+    return cached[1]
 
-    # Apply shading for walls hit on Y-sides (horizontal walls)
-    if side_hit == 1:
-        shade_overlay = pygame.Surface((config.STRIP_WIDTH, line_height_on_screen), pygame.SRCALPHA)
-        shade_overlay.fill((0, 0, 0, int(255 * (1.0 - config.WALL_TEXTURE_DARKEN_FACTOR)))) # Darken
-        screen.blit(shade_overlay, (screen_x_pos, draw_start_y))
+def draw_walls(screen, hits):
+    """Draws all textured wall columns of a frame straight into the screen's pixel buffer.
+
+    On an 8-bit Surface from view_surface the palette-index textures are drawn, shaded and
+    fogged through the shade table.
+    """
+    fallback_colors = np.array([screen.map_rgb(config.BASE_WALL_COLOR), screen.map_rgb(config.SHADED_WALL_COLOR)])
+    pixels = pygame.surfarray.pixels2d(screen)
+    if screen.get_bitsize() == 8:
+        write_wall_pixels(pixels, hits, game_assets.get('wall_indices'), game_assets['wall_texture_ids'],
+                          fallback_colors, shade_table=game_assets['shade_table'])
+    else:
+        wall_columns = mapped_columns(screen, 'wall_columns') if game_assets.get('wall_columns') is not None else None
+        write_wall_pixels(pixels, hits, wall_columns, game_assets['wall_texture_ids'], fallback_colors)
+    del pixels # Unlock the surface
+
+def write_wall_pixels(pixels, hits, wall_columns, wall_texture_ids, fallback_colors, strip_width=None,
+                      shade_table=None):
+    """Writes the wall strips of RayHits `hits` into `pixels`, a (width, height) array.
+
+    `wall_columns` is (2, textures, width, height) mapped colors from mapped_columns, or
+    (1, textures, width, height) palette indices with a `shade_table`; `wall_texture_ids` maps
+    wall values to textures. Without textures the (lit, shaded) `fallback_colors` are drawn.
+    """
+    if strip_width is None:
+        strip_width = config.STRIP_WIDTH
+    screen_height = pixels.shape[1]
+    columns = np.flatnonzero(hits.wall)
+    if columns.size == 0:
+        return
+    side = hits.side[columns]
+
+    # Calculate height of the wall slices on screen using the projected distance
+    line_height = (screen_height / hits.dist[columns]).astype(np.int64) # Unclamped height
+
+    # Calculate lowest and highest pixel to fill in each stripe
+    draw_start_y = np.maximum(0, (-line_height / 2 + screen_height / 2).astype(np.int64))
+    draw_end_y = np.minimum(screen_height, (line_height / 2 + screen_height / 2).astype(np.int64))
+
+    visible = draw_end_y > draw_start_y
+    columns, side = columns[visible], side[visible]
+    draw_start_y, draw_end_y = draw_start_y[visible], draw_end_y[visible]
+    strip_height = draw_end_y - draw_start_y
+
+    if shade_table is not None:
+        fog_level = palette.fog_levels(hits.dist[columns])
+
+    if wall_columns is None:
+        # Fallback to drawing solid color if texture not loaded
+        strip_colors = fallback_colors[side]
+        if shade_table is not None:
+            strip_colors = shade_table[fog_level, strip_colors]
+        strip_pixels = np.repeat(strip_colors, strip_height)
+    else:
+        wall_texture_width, wall_texture_height = wall_columns.shape[2:]
+        texture = wall_texture_ids[hits.wall[columns]]
+
+        # Calculate the x-coordinate on the texture
+        tex_x = (hits.tex_u[columns] * wall_texture_width).astype(np.int64)
+
+        # Adjust tex_x for texture mirroring based on ray direction (Lodev's conditions)
+        mirrored = ((side == 0) & (hits.ray_dir_x[columns] > 0)) | ((side == 1) & (hits.ray_dir_y[columns] < 0))
+        tex_x = np.where(mirrored, wall_texture_width - tex_x - 1, tex_x)
+        tex_x = np.clip(tex_x, 0, wall_texture_width - 1)
+
+        # Nearest-neighbour scale of each texture column to its strip height, the same mapping
+        # as pygame.transform.scale: strip row j shows texel j * tex_height // strip_height,
+        # so texel k covers rows [ceil(k * h / tex_height), ceil((k + 1) * h / tex_height)).
+        texel_rows = -((-np.arange(wall_texture_height + 1) * strip_height[:, None]) // wall_texture_height)
+        texel_runs = np.diff(texel_rows, axis=1)
+        if shade_table is None:
+            strip_texels = wall_columns[side, texture, tex_x]
+        else:
+            # Shade each texture column for its side and distance before it is stretched
+            shade_level = side * config.FOG_LEVELS + fog_level
+            strip_texels = shade_table[shade_level[:, None], wall_columns[0, texture, tex_x]]
+        strip_pixels = np.repeat(strip_texels.ravel(), texel_runs.ravel()) # Every strip in one go
+
+    # Mask of wall pixels per ray column; boolean assignment fills it column by column,
+    # which is exactly the order the strips were laid out in above.
+    screen_y = np.arange(screen_height)
+    wall_mask = np.zeros((hits.wall.size, screen_height), dtype=bool)
+    wall_mask[columns] = (screen_y >= draw_start_y[:, None]) & (screen_y < draw_end_y[:, None])
+
+    for offset in range(strip_width):
+        pixels[offset:hits.wall.size * strip_width:strip_width][wall_mask] = strip_pixels
 
 def draw_weapon(screen, weapon_image, weapon_rect):
-    """Draws the weapon on the screen."""
+    """Draws the weapon on the screen. Returns the Rect drawn to, or None."""
     if weapon_image and weapon_rect:
-        screen.blit(weapon_image, weapon_rect)
\ No newline at end of file
+        return screen.blit(weapon_image, weapon_rect)
+    return None
+
+class SceneCache:
+    """Copy of the last rendered view (floor, ceiling, walls and sprites) without the weapon
+    and overlay drawn on top, so frames where the camera has not moved can skip rendering it.
+
+    While matches(pose) is true the screen still shows that view: only what is drawn over it
+    has to be redrawn, after restore() has put the view back underneath. Everything in the
+    view must depend on the camera pose alone (entities do not move yet); call invalidate()
+    when something else changes it.
+    """
+
+    def __init__(self):
+        self.surface = None
+        self.pose = None
+
+    def matches(self, pose):
+        """True if the cached view was rendered from `pose` and can be reused."""
+        return config.REUSE_STATIC_FRAMES and self.pose is not None and self.pose == pose
+
+    def store(self, screen, pose):
+        """Keeps a copy of the view just rendered to `screen` from `pose`."""
+        if not config.REUSE_STATIC_FRAMES:
+            return
+        if self.surface is None or self.surface.get_size() != screen.get_size():
+            self.surface = screen.copy()
+        else:
+            self.surface.blit(screen, (0, 0))
+        self.pose = pose
+
+    def restore(self, screen, rects):
+        """Copies the cached view back over `rects` of the screen."""
+        for rect in rects:
+            screen.blit(self.surface, rect, rect)
+
+    def invalidate(self):
+        self.pose = None
\ No newline at end of file
@@ -1,254 +1,242 @@
 #/usr/bin/env python3
+import argparse
+
 import pygame
-import math
+import camera
+import capture
 import config
+import entities
 import map as game_map # Alias to avoid conflict with built-in map function
 import graphics
-
-# Player state
-player_x = config.PLAYER_INITIAL_X
-player_y = config.PLAYER_INITIAL_Y
-player_angle = config.PLAYER_INITIAL_ANGLE
-
-# Weapon state (will be populated by graphics.load_all_assets)
-pistol_idle_img = None # Will be graphics.game_assets.get('pistol_idle')
-pistol_fire_frames = [] # Will be graphics.game_assets.get('pistol_fire_frames', [])
-current_pistol_img = None
-pistol_rect = None
-is_firing = False
-pistol_animation_timer_ms = 0 # Timer for current frame
-pistol_current_frame_index = 0
-
-def main():
-    global player_x, player_y, player_angle
-    global pistol_idle_img, pistol_fire_frames, current_pistol_img, pistol_rect
-    global is_firing, pistol_animation_timer_ms, pistol_current_frame_index
-
+import parallel
+import profiler
+import queries
+import raycaster
+import replay
+import simulation
+
+def read_tick_input(keys, fire=False):
+    """Builds the simulation input from pygame's key state (see simulation.TickInput)."""
+    return simulation.TickInput(
+        forward=keys[pygame.K_w] - keys[pygame.K_s], # Forward/Backward (W/S)
+        strafe=keys[pygame.K_d] - keys[pygame.K_a], # Strafe Left/Right (A/D)
+        turn=keys[pygame.K_RIGHT] - keys[pygame.K_LEFT], # Rotation (Left/Right Arrow Keys)
+        fire=fire)
+
+def load_fire_frames(world):
+    """Returns the pistol fire frames, which load in the background, and enables firing."""
+    pistol_fire_frames = graphics.game_assets.get('pistol_fire_frames', [])
+    if not pistol_fire_frames:
+        print(f"Failed to load one or more pistol fire animation frames. Firing animation may be incomplete or disabled.")
+    world.weapon.num_fire_frames = len(pistol_fire_frames)
+    return pistol_fire_frames
+
+def fire_hitscan(world, world_entities):
+    """Resolves the shot fired in the tick just run: removes the entity it hits, if any.
+
+    The shot leaves from where the player was when it fired, at the start of the tick.
+    Returns True if something was hit.
+    """
+    player = world.player
+    _, target = queries.hitscan(player.prev_x, player.prev_y, player.prev_angle, world_entities)
+    if target < 0:
+        return False
+    world_entities.remove(int(target))
+    return True
+
+def next_resolution():
+    """Returns the entry of config.RESOLUTIONS after the current screen size."""
+    size = (config.SCREEN_WIDTH, config.SCREEN_HEIGHT)
+    index = config.RESOLUTIONS.index(size) + 1 if size in config.RESOLUTIONS else 0
+    return config.RESOLUTIONS[index % len(config.RESOLUTIONS)]
+
+def main(record_path=None, replay_path=None, capture_path=None):
+    """Runs the game. The paths default to config.RECORD_INPUT_PATH, REPLAY_INPUT_PATH and
+    CAPTURE_PATH: record every tick's input, replay a recording instead of live input, and
+    stream the rendered frames to a raw video file."""
+    record_path = record_path or config.RECORD_INPUT_PATH
+    replay_path = replay_path or config.REPLAY_INPUT_PATH
+    capture_path = capture_path or config.CAPTURE_PATH
     pygame.init()
+    if config.MAP_PATH:
+        game_map.load_map(config.MAP_PATH)
     screen = graphics.init_screen() # Initialize screen FIRST
     graphics.load_all_assets() # Load all game assets
     clock = pygame.time.Clock()
-
-    # Initialize weapon state from loaded assets
+    frame_profiler = profiler.FrameProfiler()
+    parallel_renderer = parallel.ParallelRenderer() if config.RENDER_WORKERS > 0 else None
+    scene_cache = graphics.SceneCache()
+    world_entities = entities.spawn_entities()
+    # Weapon graphics from loaded assets; the fire frames are fetched on the first shot
     pistol_idle_img = graphics.game_assets.get('pistol_idle')
-    pistol_fire_frames = graphics.game_assets.get('pistol_fire_frames', [])
+    pistol_fire_frames = None
+    pistol_rect = None
+
+    playback = replay.InputReplay(replay_path) if replay_path else None
+    if playback:
+        world = playback.new_world()
+        pistol_fire_frames = load_fire_frames(world) # Clicks come from the recording
+        print(f"Replaying {len(playback)} ticks from '{replay_path}'.")
+    else:
+        world = simulation.World()
+    recorder = replay.InputRecorder(record_path, world) if record_path else None
+    frame_capture = capture.FrameCapture(capture_path, screen.get_size()) if capture_path else None
 
     if pistol_idle_img:
-        current_pistol_img = pistol_idle_img
-        pistol_rect = current_pistol_img.get_rect()
+        pistol_rect = pistol_idle_img.get_rect()
         pistol_rect.centerx = config.SCREEN_WIDTH // 2
         pistol_rect.bottom = config.SCREEN_HEIGHT - config.PISTOL_Y_OFFSET
     else:
         print("Failed to load pistol idle image. Weapon will not be displayed.")
-    if not pistol_fire_frames:
-        print(f"Failed to load one or more pistol fire animation frames. Firing animation may be incomplete or disabled.")
 
+    tick_seconds = 1.0 / config.TICK_RATE
+    unsimulated_time = 0.0 # Real time not yet covered by simulation ticks, in seconds
+    fire_pending = False # A click waiting for the next tick
+    drawn_pistol_img = None # Weapon image on screen now
+    weapon_rect = overlay_rect = None # Where they were drawn over the view, None if not drawn
 
     running = True
-    while running:
-        dt = clock.tick(config.FPS) / 1000.0 # Delta time in seconds, not used yet but good practice
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1 and not is_firing and pistol_fire_frames: # Left mouse button
-                    is_firing = True
-                    pistol_current_frame_index = 0
-                    current_pistol_img = pistol_fire_frames[pistol_current_frame_index]
-                    pistol_animation_timer_ms = config.PISTOL_FIRE_ANIMATION_SPEED_MS
-                    # Future: Add sound effect here
-                    # Future: Reposition pistol_rect if fire frames have different anchor points than idle
-                    # Future: Implement hit detection logic here
-
-        # --- Handle Input ---
-        keys = pygame.key.get_pressed()
-
-        # Calculate intended movement vector components
-        move_x_component = 0
-        move_y_component = 0
-
-        # Forward/Backward (W/S)
-        if keys[pygame.K_w]:
-            move_x_component += config.MOVE_SPEED * math.cos(player_angle)
-            move_y_component += config.MOVE_SPEED * math.sin(player_angle)
-        if keys[pygame.K_s]:
-            move_x_component -= config.MOVE_SPEED * math.cos(player_angle)
-            move_y_component -= config.MOVE_SPEED * math.sin(player_angle)
-
-        # Strafe Left/Right (A/D)
-        if keys[pygame.K_a]: # Strafe Left
-            move_x_component += config.MOVE_SPEED * math.cos(player_angle - config.STRAFE_ANGLE)
-            move_y_component += config.MOVE_SPEED * math.sin(player_angle - config.STRAFE_ANGLE)
-        if keys[pygame.K_d]: # Strafe Right
-            move_x_component += config.MOVE_SPEED * math.cos(player_angle + config.STRAFE_ANGLE)
-            move_y_component += config.MOVE_SPEED * math.sin(player_angle + config.STRAFE_ANGLE)
-
-        # Rotation (Left/Right Arrow Keys)
-        if keys[pygame.K_LEFT]:
-            player_angle -= config.ROT_SPEED
-        if keys[pygame.K_RIGHT]:
-            player_angle += config.ROT_SPEED
-        player_angle = (player_angle + 2 * math.pi) % (2 * math.pi) # Normalize angle to [0, 2*pi)
-
-        # --- Update Game State ---
-        # Weapon firing animation
-        if is_firing:
-            pistol_animation_timer_ms -= dt * 1000 # dt is in seconds, timer is in ms
-            if pistol_animation_timer_ms <= 0:
-                pistol_current_frame_index += 1
-                if pistol_current_frame_index >= len(pistol_fire_frames):
-                    # Animation finished
-                    is_firing = False
-                    current_pistol_img = pistol_idle_img
-                    pistol_current_frame_index = 0 # Reset for next time
-                else:
-                    # Advance to next frame
-                    current_pistol_img = pistol_fire_frames[pistol_current_frame_index]
-                    pistol_animation_timer_ms = config.PISTOL_FIRE_ANIMATION_SPEED_MS # Reset timer for new frame
-
-                # Note: If idle and fire frames have different scaled dimensions,
-                # pistol_rect might need to be updated here to keep consistent positioning.
-        # --- Collision Detection & Position Update ---
-        # New potential positions based on intended movement
-        potential_new_x = player_x + move_x_component
-        potential_new_y = player_y + move_y_component
- 
-        # Check X-axis collision:
-        # If the new x-position is valid (not in a wall), update player_x.
-        # Otherwise, player_x remains unchanged for this component of movement.
-        if 0 <= int(potential_new_x) < game_map.MAP_WIDTH and \
-           0 <= int(player_y) < game_map.MAP_HEIGHT and \
-           game_map.MAP_DATA[int(player_y)][int(potential_new_x)] == 0:
-            player_x = potential_new_x
-
-        # Check Y-axis collision (using the possibly updated player_x for the map check):
-        # If the new y-position is valid (not in a wall), update player_y.
-        # Otherwise, player_y remains unchanged for this component of movement.
-        # This method allows "sliding" along walls.
-        if 0 <= int(player_x) < game_map.MAP_WIDTH and \
-           0 <= int(potential_new_y) < game_map.MAP_HEIGHT and \
-           game_map.MAP_DATA[int(potential_new_y)][int(player_x)] == 0:
-            player_y = potential_new_y
-
-        # --- Rendering ---
-        graphics.draw_background(screen)
-
-        # Raycasting
-        angle_increment = config.FOV / config.NUM_RAYS
-
-        for i in range(config.NUM_RAYS):
-            # Calculate the angle for the current ray
-            ray_angle = player_angle - config.FOV / 2 + i * angle_increment
-            ray_angle = (ray_angle + 2 * math.pi) % (2 * math.pi) # Normalize
-
-            # Ray direction components
-            ray_dir_x = math.cos(ray_angle)
-            ray_dir_y = math.sin(ray_angle)
-
-            # Current map cell the ray is in
-            map_x_coord, map_y_coord = int(player_x), int(player_y)
-
-            # Length of ray from current position to next x or y-side
-            # delta_dist_x: distance ray travels to cross one x-grid line
-            # delta_dist_y: distance ray travels to cross one y-grid line
-            delta_dist_x = abs(1 / ray_dir_x) if ray_dir_x != 0 else float('inf')
-            delta_dist_y = abs(1 / ray_dir_y) if ray_dir_y != 0 else float('inf')
-            
-            # step_x/step_y: direction to step in x/y-direction (+1 or -1)
-            # side_dist_x/side_dist_y: length of ray from start to first x/y-side
-            if ray_dir_x < 0:
-                step_x = -1
-                side_dist_x = (player_x - map_x_coord) * delta_dist_x
-            else:
-                step_x = 1
-                side_dist_x = (map_x_coord + 1.0 - player_x) * delta_dist_x
-
-            if ray_dir_y < 0:
-                step_y = -1
-                side_dist_y = (player_y - map_y_coord) * delta_dist_y
-            else:
-                step_y = 1
-                side_dist_y = (map_y_coord + 1.0 - player_y) * delta_dist_y
-
-            hit = 0  # Wall hit? (0 = no, 1 = yes, or wall type)
-            side = 0 # Was a NS or a EW wall hit? (0 for X-side/vertical, 1 for Y-side/horizontal)
-
-            # DDA (Digital Differential Analysis) loop
-            # Max steps to prevent infinite loops in case of errors or open maps
-            max_dda_steps = game_map.MAP_WIDTH + game_map.MAP_HEIGHT + 5
-            current_dda_map_x, current_dda_map_y = map_x_coord, map_y_coord
-
-            for _ in range(max_dda_steps):
-                if side_dist_x < side_dist_y:
-                    side_dist_x += delta_dist_x
-                    current_dda_map_x += step_x
-                    side = 0 # Hit an X-side (vertical wall)
+    try:
+        while running:
+            dt = clock.tick(config.FPS) / 1000.0 # Delta time in seconds
+            frame_profiler.begin_frame()
+
+            with frame_profiler.scope('events'):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+                    if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                        scene_cache.invalidate() # Window contents lost, draw and flip a whole frame
+                    if event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_F3:
+                            frame_profiler.toggle_overlay()
+                        elif event.key == pygame.K_F4 and frame_profiler.enabled:
+                            frame_profiler.export_chrome_trace()
+                        elif event.key in (pygame.K_MINUS, pygame.K_EQUALS):
+                            step = config.FOV_STEP if event.key == pygame.K_EQUALS else -config.FOV_STEP
+                            camera.set_fov(config.FOV + step)
+                            scene_cache.invalidate()
+                        elif event.key == pygame.K_F6 and frame_capture:
+                            print("The resolution cannot change while capturing.")
+                        elif event.key == pygame.K_F6:
+                            camera.set_resolution(*next_resolution())
+                            screen = graphics.init_screen()
+                            if pistol_rect:
+                                pistol_rect.centerx = config.SCREEN_WIDTH // 2
+                                pistol_rect.bottom = config.SCREEN_HEIGHT - config.PISTOL_Y_OFFSET
+                            if parallel_renderer:
+                                # The shared framebuffer has the old size
+                                parallel_renderer.close()
+                                parallel_renderer = parallel.ParallelRenderer()
+                            scene_cache.invalidate()
+                            weapon_rect = overlay_rect = None
+                    if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and not playback: # Left mouse button
+                        if pistol_fire_frames is None:
+                            # The fire frames load in the background and are only waited for here
+                            pistol_fire_frames = load_fire_frames(world)
+                        fire_pending = True
+                        # Future: Add sound effect here
+
+            with frame_profiler.scope('simulation'):
+                # Run the fixed-rate ticks that fit in the time elapsed, capped so a long stall
+                # doesn't snowball into ever more ticks per frame
+                unsimulated_time = min(unsimulated_time + dt, config.MAX_TICKS_PER_FRAME * tick_seconds)
+                tick_input = read_tick_input(pygame.key.get_pressed(), fire_pending)
+                while unsimulated_time >= tick_seconds:
+                    if playback:
+                        if playback.finished():
+                            player = world.player
+                            print(f"Replay finished after {playback.ticks} ticks: player at ({player.x:.6f}, "
+                                  f"{player.y:.6f}), angle {player.angle:.6f}, {world.shots_fired} shots fired.")
+                            running = False
+                            break
+                        tick_input = playback.next_input()
+                    shots_fired = world.shots_fired
+                    world.step(tick_input)
+                    if world.shots_fired > shots_fired and fire_hitscan(world, world_entities):
+                        scene_cache.invalidate() # An entity went away
+                    if recorder:
+                        recorder.record(tick_input)
+                    unsimulated_time -= tick_seconds
+                    if not playback:
+                        tick_input.fire = fire_pending = False # A click fires once
+                # Draw the pose between the last two ticks that matches the current time
+                player_x, player_y, player_angle = world.player.interpolate(unsimulated_time / tick_seconds)
+
+                weapon = world.weapon
+                current_pistol_img = pistol_fire_frames[weapon.frame_index] if weapon.firing else pistol_idle_img
+
+            # --- Rendering ---
+            pose = (player_x, player_y, player_angle)
+            reuse_view = scene_cache.matches(pose)
+            if not reuse_view:
+                if parallel_renderer:
+                    # Background, raycast and walls all happen in the worker processes
+                    with frame_profiler.scope('walls'):
+                        depth_buffer = parallel_renderer.render(screen, player_x, player_y, player_angle)
                 else:
-                    side_dist_y += delta_dist_y
-                    current_dda_map_y += step_y
-                    side = 1 # Hit a Y-side (horizontal wall)
-
-                # Check if ray is out of bounds
-                if not (0 <= current_dda_map_x < game_map.MAP_WIDTH and 0 <= current_dda_map_y < game_map.MAP_HEIGHT):
-                    hit = 0 # No wall hit, ray went out of map
-                    break
-
-                if game_map.MAP_DATA[current_dda_map_y][current_dda_map_x] > 0: # Hit a wall
-                    hit = game_map.MAP_DATA[current_dda_map_y][current_dda_map_x] # Could be used for different wall types/textures
-                    break
-
-            if hit > 0:
-                # Calculate Euclidean distance along the ray to the wall
-                # The formula (map_coord - player_coord + (1 - step) / 2) / ray_dir_component
-                # gives the length of the ray to the wall intersection.
-                if side == 0: # Vertical wall hit
-                    dist_along_ray = (current_dda_map_x - player_x + (1 - step_x) / 2) / ray_dir_x if ray_dir_x != 0 else float('inf')
-                else: # Horizontal wall hit
-                    dist_along_ray = (current_dda_map_y - player_y + (1 - step_y) / 2) / ray_dir_y if ray_dir_y != 0 else float('inf')
-
-                # Correct fisheye effect:
-                # Project the distance onto the vector perpendicular to the camera plane (view direction).
-                # This is done by multiplying the ray's length by cos(angle between ray and player's direction vector).
-                # The angle of the current ray relative to the player's direct line of sight:
-                relative_ray_angle = ray_angle - player_angle
-                projected_dist = dist_along_ray * math.cos(relative_ray_angle)
-
-                # Prevent division by zero or extremely small projected distances (leading to overly tall walls)
-                if projected_dist <= 0.001: projected_dist = 0.001
-
-                # Calculate height of the wall slice on screen using the projected distance
-                line_height_raw = int(config.SCREEN_HEIGHT / projected_dist) # Unclamped height
-
-                # Calculate lowest and highest pixel to fill in current stripe
-                draw_start_y_unclamped = -line_height_raw / 2 + config.SCREEN_HEIGHT / 2
-                draw_end_y_unclamped = line_height_raw / 2 + config.SCREEN_HEIGHT / 2
-
-                clamped_draw_start_y = max(0, int(draw_start_y_unclamped))
-                clamped_draw_end_y = min(config.SCREEN_HEIGHT, int(draw_end_y_unclamped))
-                
-                on_screen_strip_height = clamped_draw_end_y - clamped_draw_start_y
-
-                if on_screen_strip_height > 0:
-                    # Calculate where the wall was hit (for texture mapping)
-                    wall_hit_coord_on_segment = 0.0
-                    if side == 0: # Vertical wall
-                        wall_hit_coord_on_segment = player_y + dist_along_ray * ray_dir_y # Use dist_along_ray
-                    else: # Horizontal wall
-                        wall_hit_coord_on_segment = player_x + dist_along_ray * ray_dir_x # Use dist_along_ray
-                    wall_hit_coord_on_segment -= math.floor(wall_hit_coord_on_segment) # Get fractional part
-
-                    # Draw the textured wall strip
-                    screen_x_pos = i * config.STRIP_WIDTH
-                    graphics.draw_wall_strip(screen, screen_x_pos, clamped_draw_start_y, on_screen_strip_height,
-                                             wall_hit_coord_on_segment, side, ray_dir_x, ray_dir_y)
-
-        # Draw weapon
-        graphics.draw_weapon(screen, current_pistol_img, pistol_rect)
-
-        pygame.display.flip()
-
+                    # The screen, or the 8-bit framebuffer with config.INDEXED_COLOR
+                    view = graphics.view_surface(screen)
+                    with frame_profiler.scope('background'):
+                        graphics.draw_floor_and_ceiling(view, player_x, player_y, player_angle)
+
+                    # Raycasting (all columns at once, see raycaster.py)
+                    with frame_profiler.scope('raycast'):
+                        hits = raycaster.cast_rays(player_x, player_y, player_angle)
+                    with frame_profiler.scope('walls'):
+                        graphics.draw_walls(view, hits)
+                        graphics.present_view(screen, view)
+                    depth_buffer = raycaster.depth_buffer(hits)
+
+                # Entity sprites, hidden behind nearer walls using the wall pass's depth buffer
+                with frame_profiler.scope('sprites'):
+                    entities.draw_sprites(screen, world_entities, player_x, player_y, player_angle, depth_buffer)
+                scene_cache.store(screen, pose)
+
+            # With the camera still, the screen already shows this frame unless the weapon or the
+            # overlay changed (the overlay changes every frame it is shown, or when it gets hidden)
+            redraw_layers = not reuse_view or current_pistol_img is not drawn_pistol_img or \
+                            frame_profiler.show_overlay or overlay_rect is not None
+            layer_rects = [rect for rect in (weapon_rect, overlay_rect) if rect is not None]
+            if redraw_layers:
+                if reuse_view:
+                    scene_cache.restore(screen, layer_rects)
+
+                # Draw weapon
+                with frame_profiler.scope('weapon'):
+                    weapon_rect = graphics.draw_weapon(screen, current_pistol_img, pistol_rect)
+                drawn_pistol_img = current_pistol_img
+
+                with frame_profiler.scope('overlay'):
+                    overlay_rect = frame_profiler.draw_overlay(screen)
+
+            if frame_capture:
+                with frame_profiler.scope('capture'):
+                    frame_capture.capture(screen)
+
+            with frame_profiler.scope('flip'):
+                if not reuse_view:
+                    pygame.display.flip()
+                elif redraw_layers:
+                    # Erased and newly drawn areas
+                    pygame.display.update(layer_rects + [rect for rect in (weapon_rect, overlay_rect) if rect is not None])
+    finally:
+        # Keep what was recorded even if the game crashed
+        if recorder:
+            recorder.close()
+        if frame_capture:
+            frame_capture.close()
+
+    if frame_profiler.enabled:
+        frame_profiler.export_chrome_trace()
+    if parallel_renderer:
+        parallel_renderer.close()
     pygame.quit()
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description="Raycaster demo")
+    parser.add_argument('--record', metavar='PATH', help="Record every tick's input to this file")
+    parser.add_argument('--replay', metavar='PATH', help="Replay a recording instead of reading the keyboard")
+    parser.add_argument('--capture', metavar='PATH', help="Stream the rendered frames to this raw video file")
+    args = parser.parse_args()
+    main(args.record, args.replay, args.capture)
@@ -1,16 +1,119 @@
-# Map definition (1 for wall, 0 for empty space)
+import struct
+import sys
+
+import numpy as np
+
+import config
+
+# Map definition (0 for empty space, anything else is a wall; the value picks its texture,
+# see WALL_TYPE_ATLAS_TILES in config.py)
 # Feel free to modify this map!
 MAP_DATA = [
     [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
     [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-    [1, 0, 1, 1, 0, 1, 0, 1, 0, 1, 1, 1, 0, 1, 0, 1],
-    [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 1, 0, 0, 0, 1],
-    [1, 0, 1, 0, 0, 0, 0, 1, 0, 1, 0, 0, 0, 1, 0, 1],
-    [1, 0, 1, 0, 1, 1, 0, 1, 0, 1, 1, 1, 0, 1, 0, 1],
+    [1, 0, 2, 2, 0, 1, 0, 1, 0, 3, 3, 3, 0, 1, 0, 1],
+    [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 3, 0, 0, 0, 1],
+    [1, 0, 1, 0, 0, 0, 0, 4, 0, 1, 0, 0, 0, 1, 0, 1],
+    [1, 0, 1, 0, 5, 5, 0, 4, 0, 1, 1, 1, 0, 1, 0, 1],
     [1, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-    [1, 0, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 0, 1, 1, 1],
+    [1, 0, 2, 2, 2, 2, 0, 4, 4, 4, 4, 4, 0, 1, 1, 1],
     [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
     [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
 ]
-MAP_WIDTH = len(MAP_DATA[0])
-MAP_HEIGHT = len(MAP_DATA)
\ No newline at end of file
+
+# The active map. GRID is a uint8 array indexed [y, x] (possibly a read-only memory map);
+# CLEARANCE holds, per empty cell, the radius r such that every cell within Chebyshev
+# distance r is empty and inside the map, or is None for maps too small to benefit.
+# Use set_map/load_map to change them; other modules read them through this module.
+GRID = None
+MAP_WIDTH = 0
+MAP_HEIGHT = 0
+CLEARANCE = None
+
+# Binary map file layout: header, then GRID row-major, then CLEARANCE if present
+_FILE_MAGIC = b'RCMAP\x00\x01\x00'
+_FILE_HEADER = struct.Struct('<8sIII') # magic, width, height, has_clearance
+
+def compute_clearance(grid, max_radius=None):
+    """Returns the clearance field of `grid` as uint8, capped at `max_radius`.
+
+    Built by repeatedly eroding the empty-cell mask with a 3x3 square, with everything outside
+    the map counting as wall; a cell's clearance is the number of erosions it survives.
+    """
+    if max_radius is None:
+        max_radius = config.MAP_MAX_CLEARANCE
+    free = np.asarray(grid) == 0
+    clearance = np.zeros(free.shape, dtype=np.uint8)
+    for _ in range(max_radius):
+        # Separable 3x3 erosion: vertical neighbours, then horizontal neighbours
+        eroded = free.copy()
+        eroded[0, :] = False
+        eroded[-1, :] = False
+        eroded[1:-1, :] &= free[:-2, :] & free[2:, :]
+        free = eroded.copy()
+        free[:, 0] = False
+        free[:, -1] = False
+        free[:, 1:-1] &= eroded[:, :-2] & eroded[:, 2:]
+        if not free.any():
+            break
+        clearance += free
+    return clearance
+
+def set_map(grid, clearance=None):
+    """Makes `grid` (anything convertible to a 2D uint8 array) the active map."""
+    global GRID, MAP_WIDTH, MAP_HEIGHT, CLEARANCE
+    GRID = np.asarray(grid, dtype=np.uint8)
+    MAP_HEIGHT, MAP_WIDTH = GRID.shape
+    if clearance is None and max(MAP_WIDTH, MAP_HEIGHT) >= config.MAP_SKIP_MIN_SIZE:
+        clearance = compute_clearance(GRID)
+    CLEARANCE = clearance
+
+def save_map(path, grid, with_clearance=True):
+    """Writes `grid` to a binary map file, with its precomputed clearance field by default."""
+    grid = np.ascontiguousarray(grid, dtype=np.uint8)
+    height, width = grid.shape
+    with open(path, 'wb') as f:
+        f.write(_FILE_HEADER.pack(_FILE_MAGIC, width, height, int(with_clearance)))
+        f.write(grid.tobytes())
+        if with_clearance:
+            f.write(compute_clearance(grid).tobytes())
+
+def load_map(path):
+    """Memory-maps a binary map file written by save_map and makes it the active map."""
+    with open(path, 'rb') as f:
+        magic, width, height, has_clearance = _FILE_HEADER.unpack(f.read(_FILE_HEADER.size))
+    if magic != _FILE_MAGIC:
+        raise ValueError(f"{path} is not a raycaster map file")
+    grid = np.memmap(path, dtype=np.uint8, mode='r', offset=_FILE_HEADER.size, shape=(height, width))
+    clearance = None
+    if has_clearance:
+        clearance = np.memmap(path, dtype=np.uint8, mode='r',
+                              offset=_FILE_HEADER.size + width * height, shape=(height, width))
+    set_map(grid, clearance)
+
+def generate_map(width, height, seed=0, room_size=32, pillar_density=0.002):
+    """Returns a large test map: a lattice of rooms joined by doorways, with scattered pillars.
+
+    The cells around the configured player start are always left empty.
+    """
+    rng = np.random.default_rng(seed)
+    grid = (rng.random((height, width)) < pillar_density).astype(np.uint8)
+    grid[::room_size, :] = 1
+    grid[:, ::room_size] = 1
+    # Two doorways in every room wall
+    for offset in (room_size // 4, 3 * room_size // 4):
+        grid[::room_size, offset::room_size] = 0
+        grid[offset::room_size, ::room_size] = 0
+    grid[0, :] = grid[-1, :] = 1
+    grid[:, 0] = grid[:, -1] = 1
+    start_x, start_y = int(config.PLAYER_INITIAL_X), int(config.PLAYER_INITIAL_Y)
+    grid[max(start_y - 1, 1):start_y + 2, max(start_x - 1, 1):start_x + 2] = 0
+    return grid
+
+set_map(MAP_DATA)
+
+if __name__ == '__main__':
+    # Usage: python map.py OUTPUT_PATH [SIZE] - writes a SIZE x SIZE test map (default 4096)
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+    save_map(sys.argv[1], generate_map(size, size))
+    print(f"Wrote {size}x{size} map to {sys.argv[1]}")
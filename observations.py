@@ -0,0 +1,107 @@
+"""Batched rendering of many cameras at once, to NumPy arrays and without a display.
+
+For agents that use the raycaster as an environment: pass arrays of camera poses and get back
+stacked observations, either RGB frames or per-column depth and wall-id buffers. All cameras
+are raycast together in one vectorized DDA pass over the shared map, and frames are drawn for
+the whole batch at once by laying the cameras side by side as the columns of one wide image,
+with the same wall and floor code as the game's renderer.
+
+    frames = render_frames(xs, ys, angles, width=64, height=64) # (cameras, 64, 64, 3) uint8
+    depth, wall = depth_buffers(xs, ys, angles, num_rays=64)     # (cameras, 64) each
+
+Textures are loaded with graphics.load_textures() on first use. Sprites and the weapon are
+not drawn.
+"""
+import sys
+
+import numpy as np
+import pygame
+
+import camera
+import config
+import graphics
+import raycaster
+
+# Pixel format the batch is drawn in: 32 bits with R, G, B in the first three bytes in memory,
+# so the finished image reads back as RGB bytes. Made on first use, see _format_surface.
+_format = None
+
+def _format_surface():
+    global _format
+    if _format is None:
+        if sys.byteorder == 'little':
+            masks = (0x000000FF, 0x0000FF00, 0x00FF0000, 0)
+        else:
+            masks = (0xFF000000, 0x00FF0000, 0x0000FF00, 0)
+        _format = pygame.Surface((1, 1), 0, 32, masks)
+    return _format
+
+def _camera_arrays(x, y, angle, fov):
+    """Broadcasts the camera poses to (cameras, 1) float64 arrays."""
+    if fov is None:
+        fov = config.FOV
+    arrays = np.broadcast_arrays(*(np.atleast_1d(np.asarray(value, dtype=np.float64))
+                                   for value in (x, y, angle, fov)))
+    if arrays[0].ndim != 1:
+        raise ValueError("Camera poses must be scalars or 1-D arrays")
+    return [array[:, None] for array in arrays]
+
+def cast_cameras(x, y, angle, fov=None, num_rays=64):
+    """Raycasts a batch of cameras in one pass and returns a raycaster.RayHits.
+
+    `x`, `y`, `angle` and `fov` are scalars or 1-D arrays with one entry per camera; `fov`
+    defaults to config.FOV. The RayHits fields are (cameras, num_rays) arrays, rays spread
+    over each camera's field of view the same way as raycaster.cast_rays.
+    """
+    x, y, angle, fov = _camera_arrays(x, y, angle, fov)
+    ray_dir_x, ray_dir_y = camera.rotate(angle, camera.column_slopes(num_rays, fov))
+    return raycaster.cast_camera_rays(x, y, ray_dir_x, ray_dir_y)
+
+def depth_buffers(x, y, angle, fov=None, num_rays=64):
+    """Returns per-column (depth, wall) buffers for a batch of cameras, see cast_cameras.
+
+    depth is float32 (cameras, num_rays): the perpendicular distance to the wall in each
+    column, inf where no wall was hit. wall is uint8 (cameras, num_rays): the map value of
+    that wall, 0 for none.
+    """
+    hits = cast_cameras(x, y, angle, fov, num_rays)
+    return raycaster.depth_buffer(hits).astype(np.float32), hits.wall
+
+def render_frames(x, y, angle, fov=None, width=64, height=64):
+    """Renders a batch of cameras and returns their frames as a (cameras, height, width, 3)
+    uint8 RGB array. One ray per pixel column; see cast_cameras for the poses."""
+    if 'wall_texture_ids' not in graphics.game_assets:
+        graphics.load_textures()
+    hits = cast_cameras(x, y, angle, fov, width)
+    num_cameras = hits.wall.shape[0]
+    flat_hits = raycaster.RayHits(*(np.ravel(field) for field in hits))
+    target = _format_surface()
+
+    # All frames side by side in one row-major image; .T gives the [x, y] view the writers take
+    image = np.empty((height, num_cameras * width), dtype=np.uint32)
+    pixels = image.T
+
+    if graphics.game_assets.get('floor_columns') is not None:
+        x, y, angle, fov = _camera_arrays(x, y, angle, fov)
+        slope = camera.column_slopes(width, fov)
+        graphics.write_floor_texels(pixels, slope.ravel(), np.repeat(x.ravel(), width), np.repeat(y.ravel(), width),
+                                    np.repeat(angle.ravel(), width),
+                                    graphics.mapped_columns(target, 'floor_columns'), strip_width=1)
+    else:
+        graphics.write_background_pixels(pixels, target.map_rgb(config.CEILING_COLOR),
+                                         target.map_rgb(config.FLOOR_COLOR))
+
+    wall_columns = None
+    if graphics.game_assets.get('wall_columns') is not None:
+        wall_columns = graphics.mapped_columns(target, 'wall_columns')
+    fallback_colors = np.array([target.map_rgb(config.BASE_WALL_COLOR), target.map_rgb(config.SHADED_WALL_COLOR)])
+    graphics.write_wall_pixels(pixels, flat_hits, wall_columns, graphics.game_assets['wall_texture_ids'],
+                               fallback_colors, strip_width=1)
+
+    # Regroup by camera and drop the padding byte; a copy per channel is much faster than
+    # letting NumPy copy 3-byte pixels at a 4-byte stride
+    channels = image.view(np.uint8).reshape(height, num_cameras, width, 4).transpose(1, 0, 2, 3)
+    frames = np.empty((num_cameras, height, width, 3), dtype=np.uint8)
+    for channel in range(3):
+        frames[..., channel] = channels[..., channel]
+    return frames
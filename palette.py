@@ -0,0 +1,87 @@
+"""Shared 8-bit palette and shade tables for the indexed-color render path.
+
+With config.INDEXED_COLOR the textures are quantized to one palette at load time and the
+floor, ceiling and walls are drawn into an 8-bit framebuffer. Lighting is a lookup in a
+shade table: shade_table[level, index] is the palette index of color `index` seen at shade
+`level`, where the level combines the wall side (Y sides darkened like the RGB path) and the
+distance fog. Shading a pixel is one table lookup, so fog costs no more than no fog.
+
+    level = side * config.FOG_LEVELS + fog_levels(distance)
+"""
+import numpy as np
+
+import config
+
+def median_cut(colors, num_colors=256):
+    """Returns a palette of at most `num_colors` colors for an (n, 3) array of RGB colors.
+
+    Repeatedly splits the box of colors with the widest channel range at the median of that
+    channel, then takes the mean color of every box.
+    """
+    colors = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+    boxes = [colors]
+    ranges = [np.ptp(colors, axis=0)] # Per-channel range of each box
+    while len(boxes) < num_colors:
+        widest = max(range(len(boxes)), key=lambda i: ranges[i].max())
+        if ranges[widest].max() == 0:
+            break # Every box is a single color
+        box = boxes.pop(widest)
+        channel = int(np.argmax(ranges.pop(widest)))
+        middle = len(box) // 2
+        order = np.argpartition(box[:, channel], middle)
+        for half in (box[order[:middle]], box[order[middle:]]):
+            boxes.append(half)
+            ranges.append(np.ptp(half, axis=0))
+    means = np.array([box.mean(axis=0) for box in boxes]).round().astype(np.uint8)
+    return np.unique(means, axis=0) # Neighbouring boxes can round to the same color
+
+def nearest_colors(colors, palette, chunk_size=16384):
+    """Returns the index of the nearest `palette` color (Euclidean RGB) for each color in
+    `colors`, an (..., 3) array, as uint8 of shape colors.shape[:-1]."""
+    colors = np.asarray(colors)
+    flat = colors.reshape(-1, 3).astype(np.float32)
+    palette = palette.astype(np.float32)
+    palette_norm = (palette ** 2).sum(axis=1)
+    indices = np.empty(len(flat), dtype=np.uint8)
+    for start in range(0, len(flat), chunk_size):
+        chunk = flat[start:start + chunk_size]
+        # |c - p|^2 without the |c|^2 term, which is the same for every palette entry
+        indices[start:start + chunk_size] = np.argmin(palette_norm - 2 * chunk @ palette.T, axis=1)
+    return indices.reshape(colors.shape[:-1])
+
+def shaded_colors(colors, num_levels=None):
+    """Returns `colors` (..., 3) as seen at every shade level, shape (2 * num_levels, ..., 3) float.
+
+    Levels [0, num_levels) are lit X sides, [num_levels, 2 * num_levels) Y sides darkened by
+    config.WALL_TEXTURE_DARKEN_FACTOR; within each, the color fades linearly to
+    config.FOG_COLOR, reaching it at the last level.
+    """
+    if num_levels is None:
+        num_levels = config.FOG_LEVELS
+    colors = np.asarray(colors, dtype=np.float32)
+    fog = np.linspace(0.0, 1.0, num_levels, dtype=np.float32) if num_levels > 1 else np.zeros(1, np.float32)
+    fog = fog.reshape((num_levels,) + (1,) * colors.ndim)
+    fog_color = np.asarray(config.FOG_COLOR, dtype=np.float32)
+    sides = [colors, colors * config.WALL_TEXTURE_DARKEN_FACTOR]
+    return np.concatenate([side * (1 - fog) + fog_color * fog for side in sides])
+
+def build_palette(colors, num_colors=256):
+    """Returns a palette for textures with the RGB `colors`, covering their shaded and fogged
+    versions too so that the shade table has colors to map to."""
+    colors = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+    levels = shaded_colors(colors, config.FOG_LEVELS)
+    # A few evenly spaced levels of each side stand in for all of them
+    sample = levels[np.linspace(0, len(levels) - 1, 8).round().astype(np.intp)]
+    return median_cut(np.concatenate([colors, sample.reshape(-1, 3).round().astype(np.uint8)]), num_colors)
+
+def shade_table(palette):
+    """Returns the (2 * config.FOG_LEVELS, len(palette)) uint8 table mapping a shade level and
+    a palette index to the palette index nearest that color at that level."""
+    return nearest_colors(shaded_colors(palette, config.FOG_LEVELS), palette)
+
+def fog_levels(distance):
+    """Returns the fog level (0 .. config.FOG_LEVELS - 1) of each perpendicular `distance`."""
+    if not config.FOG_DISTANCE:
+        return np.zeros(np.shape(distance), dtype=np.intp)
+    levels = np.asarray(distance) * ((config.FOG_LEVELS - 1) / config.FOG_DISTANCE)
+    return np.minimum(levels, config.FOG_LEVELS - 1).astype(np.intp)
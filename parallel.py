@@ -0,0 +1,136 @@
+"""Multi-process column-band rendering.
+
+The screen is split into vertical bands of ray columns, one task per band per frame, and
+handed to a persistent pool of worker processes. Workers raycast and texture their band
+straight into a framebuffer in shared memory, which the main process blits once per frame,
+and leave each column's wall distance in a shared depth buffer for the sprite pass.
+The map grid and the mapped wall and floor textures are copied into shared memory once when the pool
+starts, so a frame's tasks only carry the band bounds and the camera pose. A renderer keeps
+the map that was active when it was created.
+"""
+import ctypes
+import multiprocessing
+
+import numpy as np
+import pygame
+
+import config
+import graphics
+import map as game_map
+import raycaster
+
+# Shared arrays of the current worker process, set up by _init_worker
+_worker = {}
+
+def _shared_copy(array):
+    """Copies `array` into a new lock-free shared memory block and returns (block, dtype, shape)."""
+    array = np.ascontiguousarray(array)
+    block = multiprocessing.RawArray(ctypes.c_uint8, max(array.nbytes, 1))
+    np.frombuffer(block, dtype=array.dtype, count=array.size)[:] = array.ravel()
+    return block, array.dtype.str, array.shape
+
+def _shared_view(shared):
+    """Returns a NumPy view of a block made by _shared_copy."""
+    block, dtype, shape = shared
+    return np.frombuffer(block, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+
+def _init_worker(framebuffer, depth, grid, clearance, wall_columns, wall_texture_ids, floor_columns, colors,
+                 settings):
+    """Pool initializer: attaches the shared arrays and applies the parent's render settings."""
+    for name, value in settings.items():
+        setattr(config, name, value)
+    _worker['framebuffer'] = _shared_view(framebuffer)
+    _worker['depth'] = _shared_view(depth)
+    _worker['grid'] = _shared_view(grid)
+    _worker['clearance'] = _shared_view(clearance) if clearance is not None else None
+    _worker['wall_columns'] = _shared_view(wall_columns) if wall_columns is not None else None
+    _worker['wall_texture_ids'] = wall_texture_ids
+    _worker['floor_columns'] = _shared_view(floor_columns) if floor_columns is not None else None
+    _worker['colors'] = colors
+
+def _render_band(first_column, last_column, player_x, player_y, player_angle, fov):
+    """Renders ray columns [first_column, last_column) into the shared framebuffer."""
+    config.FOV = fov # May change between frames, see camera.set_fov
+    colors = _worker['colors']
+    # The framebuffer is stored row-major (height, width) like a Surface; .T gives [x, y] indexing
+    pixels = _worker['framebuffer'].T[first_column * config.STRIP_WIDTH:last_column * config.STRIP_WIDTH]
+
+    columns = np.arange(first_column, last_column)
+    if _worker['floor_columns'] is not None:
+        graphics.write_floor_pixels(pixels, columns, player_x, player_y, player_angle, _worker['floor_columns'])
+    else:
+        graphics.write_background_pixels(pixels, colors['ceiling'], colors['floor'])
+
+    hits = raycaster.cast_rays(player_x, player_y, player_angle,
+                               columns=columns,
+                               grid=_worker['grid'], clearance=_worker['clearance'])
+    graphics.write_wall_pixels(pixels, hits, _worker['wall_columns'], _worker['wall_texture_ids'], colors['walls'])
+    _worker['depth'][first_column:last_column] = raycaster.depth_buffer(hits)
+
+class ParallelRenderer:
+    """Renders frames with a pool of worker processes, one column band per task.
+
+    Call render() once per frame instead of draw_floor_and_ceiling/cast_rays/draw_walls, and close()
+    when done. Textures must already be loaded (graphics.load_all_assets).
+    """
+
+    def __init__(self, num_workers=None, bands_per_worker=None):
+        self.num_workers = num_workers if num_workers is not None else config.RENDER_WORKERS
+        if bands_per_worker is None:
+            bands_per_worker = config.RENDER_BANDS_PER_WORKER
+        width, height = config.NUM_RAYS * config.STRIP_WIDTH, config.SCREEN_HEIGHT
+
+        # Framebuffer in shared memory, wrapped by a Surface so one blit puts it on screen
+        framebuffer = _shared_copy(np.zeros((height, width), dtype=np.uint32))
+        self.frame_surface = pygame.image.frombuffer(framebuffer[0], (width, height), 'RGBX')
+        depth = _shared_copy(np.full(config.NUM_RAYS, np.inf))
+        self.depth_buffer = _shared_view(depth) # See raycaster.depth_buffer
+
+        wall_columns = None
+        if graphics.game_assets.get('wall_columns') is not None:
+            wall_columns = _shared_copy(graphics.mapped_columns(self.frame_surface, 'wall_columns'))
+        floor_columns = None
+        if graphics.game_assets.get('floor_columns') is not None:
+            floor_columns = _shared_copy(graphics.mapped_columns(self.frame_surface, 'floor_columns'))
+        colors = {
+            'ceiling': self.frame_surface.map_rgb(config.CEILING_COLOR),
+            'floor': self.frame_surface.map_rgb(config.FLOOR_COLOR),
+            'walls': np.array([self.frame_surface.map_rgb(config.BASE_WALL_COLOR),
+                               self.frame_surface.map_rgb(config.SHADED_WALL_COLOR)]),
+        }
+        # Worker processes are spawned fresh and import config from disk, so pass along the
+        # settings that may have been changed at runtime. A new resolution needs a new
+        # renderer; the field of view comes with every frame's tasks.
+        settings = {name: getattr(config, name) for name in
+                    ('SCREEN_HEIGHT', 'NUM_RAYS', 'STRIP_WIDTH', 'RAYCAST_MODE', 'SPAN_SAMPLE_SPACING')}
+
+        # Band bounds in ray columns; more bands than workers evens out uneven band costs
+        num_bands = max(1, self.num_workers * bands_per_worker)
+        bounds = np.linspace(0, config.NUM_RAYS, num_bands + 1).astype(int)
+        self.bands = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+        grid = _shared_copy(game_map.GRID)
+        clearance = _shared_copy(game_map.CLEARANCE) if game_map.CLEARANCE is not None else None
+
+        # Spawn rather than fork: the parent has SDL initialized, which must not be duplicated
+        context = multiprocessing.get_context('spawn')
+        self.pool = context.Pool(
+            self.num_workers, initializer=_init_worker,
+            initargs=(framebuffer, depth, grid, clearance, wall_columns, graphics.game_assets['wall_texture_ids'],
+                      floor_columns, colors, settings))
+        self._framebuffer = framebuffer # Keep the shared block alive as long as the Surface
+
+    def render(self, screen, player_x, player_y, player_angle):
+        """Renders background and walls for one frame and blits them onto `screen`.
+
+        Returns the frame's depth buffer (valid until the next call).
+        """
+        self.pool.starmap(_render_band, [(first, last, player_x, player_y, player_angle, config.FOV)
+                                         for first, last in self.bands])
+        screen.blit(self.frame_surface, (0, 0))
+        return self.depth_buffer
+
+    def close(self):
+        """Shuts down the worker processes."""
+        self.pool.close()
+        self.pool.join()
@@ -0,0 +1,165 @@
+"""Per-stage frame profiler.
+
+Timings are kept in a fixed-size ring buffer, one row per frame and one column per stage,
+so recording costs two perf_counter() calls per stage and no allocation. While disabled,
+scope() hands back a shared no-op context manager.
+"""
+import contextlib
+import json
+import time
+
+import numpy as np
+import pygame
+
+import config
+
+# Stages of the game loop, in the order they run
+STAGES = ('events', 'simulation', 'background', 'raycast', 'walls', 'sprites', 'weapon', 'overlay', 'capture', 'flip')
+
+_NULL_SCOPE = contextlib.nullcontext()
+
+class _Scope:
+    """Context manager that records one stage of the current frame."""
+    __slots__ = ('profiler', 'stage_index', 'start')
+
+    def __init__(self, profiler, stage_index):
+        self.profiler = profiler
+        self.stage_index = stage_index
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        profiler = self.profiler
+        row = profiler.frame_index % profiler.capacity
+        profiler.starts[row, self.stage_index] = self.start - profiler.epoch
+        profiler.durations[row, self.stage_index] += end - self.start
+        return False
+
+class FrameProfiler:
+    """Records how long each stage of each frame takes."""
+
+    def __init__(self, capacity=None, enabled=None):
+        self.capacity = capacity if capacity is not None else config.PROFILER_CAPACITY
+        self.enabled = enabled if enabled is not None else config.PROFILER_ENABLED
+        self.show_overlay = self.enabled
+        # Seconds since `epoch`; NaN marks a stage that did not run in that frame
+        self.starts = np.full((self.capacity, len(STAGES)), np.nan)
+        self.durations = np.zeros((self.capacity, len(STAGES)))
+        self.frame_index = -1 # Index of the frame being recorded, -1 before the first frame
+        self.epoch = time.perf_counter()
+        self._scopes = {name: _Scope(self, i) for i, name in enumerate(STAGES)}
+        self._font = None
+
+    def begin_frame(self):
+        """Starts recording a new frame, overwriting the oldest one once the buffer is full."""
+        if not self.enabled:
+            return
+        self.frame_index += 1
+        row = self.frame_index % self.capacity
+        self.starts[row] = np.nan
+        self.durations[row] = 0.0
+
+    def scope(self, stage):
+        """Returns a context manager that times `stage` (one of STAGES) in the current frame."""
+        if not self.enabled or self.frame_index < 0:
+            return _NULL_SCOPE
+        return self._scopes[stage]
+
+    def toggle_overlay(self):
+        """Shows or hides the overlay. Recording is switched on together with the overlay."""
+        self.show_overlay = not self.show_overlay
+        if self.show_overlay:
+            self.enabled = True
+
+    def recorded_frames(self):
+        """Returns the ring buffer rows of the recorded frames, oldest first."""
+        count = min(self.frame_index + 1, self.capacity)
+        first = self.frame_index + 1 - count
+        return np.arange(first, first + count) % self.capacity
+
+    def stage_averages_ms(self, num_frames=None):
+        """Returns {stage: mean milliseconds} over the last completed `num_frames` frames."""
+        if num_frames is None:
+            num_frames = config.PROFILER_OVERLAY_FRAMES
+        rows = self.recorded_frames()[:-1][-num_frames:] # Skip the frame still being recorded
+        if rows.size == 0:
+            return {name: 0.0 for name in STAGES}
+        averages = self.durations[rows].mean(axis=0) * 1000
+        return dict(zip(STAGES, averages.tolist()))
+
+    def stage_run_average_ms(self, stage, num_frames=None):
+        """Returns the mean milliseconds of `stage` over the last completed `num_frames` frames
+        in which it ran, or None if it ran in none of them.
+
+        Unlike stage_averages_ms, frames that skipped the stage (e.g. the render stages while
+        the view is reused) do not count as 0 ms.
+        """
+        if num_frames is None:
+            num_frames = config.PROFILER_OVERLAY_FRAMES
+        stage_index = STAGES.index(stage)
+        rows = self.recorded_frames()[:-1][-num_frames:]
+        rows = rows[~np.isnan(self.starts[rows, stage_index])]
+        if rows.size == 0:
+            return None
+        return float(self.durations[rows, stage_index].mean() * 1000)
+
+    def draw_overlay(self, screen):
+        """Draws the rolling per-stage timings and the raycaster throughput in the top-left corner.
+
+        The stage timings are averaged over all frames, counting skipped stages as 0 ms, so
+        they add up to the frame time; rays/s only counts the frames that raycast.
+
+        Returns the Rect drawn to, or None while the overlay is hidden.
+        """
+        if not self.show_overlay:
+            return None
+        if self._font is None:
+            self._font = pygame.font.Font(None, config.PROFILER_FONT_SIZE)
+
+        averages = self.stage_averages_ms()
+        frame_ms = sum(averages.values())
+        raycast_ms = self.stage_run_average_ms('raycast')
+        rows = [('ms, all frames', '')]
+        rows += [(name, f"{ms:.2f} ms") for name, ms in averages.items()]
+        rows.append(('frame', f"{frame_ms:.2f} ms"))
+        if raycast_ms: # Not while every recent frame reused the view
+            rows.append(('rays/s', f"{config.NUM_RAYS / raycast_ms / 1e3:.2f} M"))
+        else:
+            rows.append(('rays/s', "-"))
+
+        line_height = self._font.get_linesize()
+        panel = pygame.Surface((170, line_height * len(rows) + 8), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 160))
+        for i, (label, value) in enumerate(rows):
+            y = 4 + i * line_height
+            panel.blit(self._font.render(label, True, config.PROFILER_TEXT_COLOR), (6, y))
+            value_image = self._font.render(value, True, config.PROFILER_TEXT_COLOR)
+            panel.blit(value_image, (panel.get_width() - 6 - value_image.get_width(), y))
+        return screen.blit(panel, (4, 4))
+
+    def export_chrome_trace(self, path=None):
+        """Writes the recorded frames as Chrome trace-event JSON (chrome://tracing, Perfetto)."""
+        if path is None:
+            path = config.PROFILER_TRACE_PATH
+        events = []
+        for row in self.recorded_frames():
+            for stage_index, name in enumerate(STAGES):
+                start = self.starts[row, stage_index]
+                if np.isnan(start):
+                    continue
+                events.append({
+                    'name': name,
+                    'cat': 'frame',
+                    'ph': 'X', # Complete event: start timestamp plus duration
+                    'ts': start * 1e6,
+                    'dur': self.durations[row, stage_index] * 1e6,
+                    'pid': 1,
+                    'tid': 1,
+                })
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        print(f"Frame trace with {len(events)} events written to {path}")
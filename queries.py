@@ -0,0 +1,88 @@
+"""Batched ray, line-of-sight and hitscan queries against the map.
+
+Every function takes scalars or arrays that broadcast together, one query per element, and
+answers all of them in one vectorized pass of the renderer's DDA (raycaster.cast), so tens
+of thousands of queries cost about as much as a frame's raycast.
+
+    hits = trace(x, y, dir_x, dir_y, max_dist=20.0)          # first wall along each ray
+    visible = line_of_sight(guards.x, guards.y, player_x, player_y) # one bool per guard
+    hits, target = hitscan(player_x, player_y, player_angle, world_entities)
+"""
+from collections import namedtuple
+
+import numpy as np
+
+import config
+import raycaster
+
+# Results of trace(), one entry per query:
+#   dist         - distance along the ray to the wall face, inf where no wall was hit
+#   wall         - map value of the wall hit, 0 for none (out of reach or left the map)
+#   map_x, map_y - cell of the wall hit
+#   side         - 0 for an X-side (vertical wall) hit, 1 for a Y-side hit
+TraceHits = namedtuple('TraceHits', ['dist', 'wall', 'map_x', 'map_y', 'side'])
+
+def trace(origin_x, origin_y, dir_x, dir_y, max_dist=None, grid=None, clearance=None):
+    """Finds the first wall along each ray and returns a TraceHits.
+
+    The directions need not be unit length but must not be zero. Walls further than
+    `max_dist` (scalar or per ray, default unlimited) are not reported, and the search stops
+    there, so short queries are cheaper. `grid` and `clearance` default to the active map.
+    """
+    dir_x = np.asarray(dir_x, dtype=np.float64)
+    dir_y = np.asarray(dir_y, dtype=np.float64)
+    length = np.hypot(dir_x, dir_y)
+    shape = np.broadcast_shapes(np.shape(origin_x), np.shape(origin_y), dir_x.shape, dir_y.shape,
+                                np.shape(max_dist) if max_dist is not None else ())
+    dist, side, wall, map_x, map_y = raycaster.cast(origin_x, origin_y, np.broadcast_to(dir_x / length, shape),
+                                                    np.broadcast_to(dir_y / length, shape), grid, clearance, max_dist)
+    dist[wall == 0] = np.inf
+    return TraceHits(dist.reshape(shape), wall.reshape(shape), map_x.reshape(shape), map_y.reshape(shape),
+                     side.reshape(shape))
+
+def trace_segments(start_x, start_y, end_x, end_y, grid=None, clearance=None):
+    """Finds the first wall on each segment from start to end; see trace.
+
+    Only walls the segment enters count, so a hit means the segment is blocked. Zero-length
+    segments never hit anything.
+    """
+    delta_x = np.subtract(end_x, start_x, dtype=np.float64)
+    delta_y = np.subtract(end_y, start_y, dtype=np.float64)
+    length = np.hypot(delta_x, delta_y)
+    empty = length == 0
+    # Any direction will do for an empty segment: it stops before its first grid line
+    delta_x = np.where(empty, 1.0, delta_x)
+    return trace(start_x, start_y, delta_x, delta_y, length, grid, clearance)
+
+def line_of_sight(start_x, start_y, end_x, end_y, grid=None, clearance=None):
+    """Returns True for each pair of points with no wall between them (bool array)."""
+    return trace_segments(start_x, start_y, end_x, end_y, grid, clearance).wall == 0
+
+def hitscan(origin_x, origin_y, angle, world_entities=None, max_dist=None, radius=None):
+    """Fires instant shots from the origins at `angle` and returns (TraceHits, target).
+
+    The TraceHits are the walls the shots stop at. target is the index into `world_entities`
+    of the entity each shot hits, or -1: the nearest entity whose centre the shot passes
+    within `radius` (default config.ENTITY_HIT_RADIUS) of, in front of the wall and within
+    `max_dist`.
+    """
+    if radius is None:
+        radius = config.ENTITY_HIT_RADIUS
+    dir_x, dir_y = np.cos(angle), np.sin(angle)
+    hits = trace(origin_x, origin_y, dir_x, dir_y, max_dist)
+    if world_entities is None or len(world_entities) == 0:
+        return hits, np.full(hits.dist.shape, -1, dtype=np.intp)
+
+    # (shots, entities): distance along each shot to each entity and how far it passes from it
+    origin_x, origin_y, dir_x, dir_y = (np.broadcast_to(value, hits.dist.shape).reshape(-1, 1)
+                                        for value in (origin_x, origin_y, dir_x, dir_y))
+    offset_x = world_entities.x - origin_x
+    offset_y = world_entities.y - origin_y
+    along = offset_x * dir_x + offset_y * dir_y
+    across = np.abs(offset_x * dir_y - offset_y * dir_x)
+    struck = (across <= radius) & (along > 0) & (along < hits.dist.reshape(-1, 1))
+    if max_dist is not None: # Shots that ran out of reach report no wall (inf) above
+        struck &= along <= np.broadcast_to(max_dist, hits.dist.shape).reshape(-1, 1)
+    along = np.where(struck, along, np.inf)
+    target = np.where(struck.any(axis=1), np.argmin(along, axis=1), -1)
+    return hits, target.reshape(hits.dist.shape)
@@ -0,0 +1,285 @@
+from collections import namedtuple
+
+import numpy as np
+
+import camera
+import config
+import map as game_map
+
+# Per-column results of a raycast. Every field is a NumPy array with one entry per ray.
+#   dist      - perpendicular distance from the camera plane to the wall, 0 where nothing was hit
+#   side      - 0 for an X-side (vertical wall) hit, 1 for a Y-side (horizontal wall) hit
+#   wall      - map value of the wall that was hit (0 = no hit, ray left the map)
+#   tex_u     - fractional position along the wall face where the ray hit it, in [0, 1)
+#   ray_dir_x, ray_dir_y - ray direction (not unit length, see camera.py), needed by the
+#                          renderer for texture mirroring
+RayHits = namedtuple('RayHits', ['dist', 'side', 'wall', 'tex_u', 'ray_dir_x', 'ray_dir_y'])
+
+def cast(origin_x, origin_y, ray_dir_x, ray_dir_y, grid=None, clearance=None, max_dist=None):
+    """Runs the DDA for every ray at once.
+
+    origin_x/origin_y are scalars or arrays broadcastable against the ray directions.
+    Returns (dist_along_ray, side, wall, map_x, map_y) arrays. dist_along_ray is the
+    distance to the wall face in units of the ray direction, the Euclidean distance for unit
+    directions; wall is 0 for rays that left the map without hitting anything.
+
+    `grid` and `clearance` default to the active map (map.GRID, map.CLEARANCE). With a
+    clearance field, rays jump across empty space in one iteration instead of cell by cell;
+    they still stop in the same cell, so the results do not change.
+
+    With `max_dist` (a scalar or one value per ray, in the same units), rays stop looking once
+    they are further than that along the ray; they report no hit (wall 0) unless the wall was within reach.
+    """
+    if grid is None:
+        grid, clearance = game_map.GRID, game_map.CLEARANCE
+    map_height, map_width = grid.shape
+
+    ray_dir_x = np.asarray(ray_dir_x, dtype=np.float64)
+    ray_dir_y = np.asarray(ray_dir_y, dtype=np.float64)
+    origin_x, origin_y, ray_dir_x, ray_dir_y = np.broadcast_arrays(
+        np.asarray(origin_x, dtype=np.float64), np.asarray(origin_y, dtype=np.float64),
+        ray_dir_x, ray_dir_y)
+    if max_dist is not None:
+        max_dist = np.broadcast_to(np.asarray(max_dist, dtype=np.float64), ray_dir_x.shape).ravel()
+    origin_x = origin_x.ravel()
+    origin_y = origin_y.ravel()
+    ray_dir_x = ray_dir_x.ravel()
+    ray_dir_y = ray_dir_y.ravel()
+    num_rays = ray_dir_x.size
+
+    map_x = origin_x.astype(np.int64)
+    map_y = origin_y.astype(np.int64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Distance the ray travels to cross one x/y grid line (inf for axis-parallel rays)
+        delta_dist_x = np.abs(1.0 / ray_dir_x)
+        delta_dist_y = np.abs(1.0 / ray_dir_y)
+
+        # Step direction and distance from the origin to the first x/y grid line
+        step_x = np.where(ray_dir_x < 0, -1, 1)
+        step_y = np.where(ray_dir_y < 0, -1, 1)
+        first_x = np.where(ray_dir_x < 0, origin_x - map_x, map_x + 1.0 - origin_x) * delta_dist_x
+        first_y = np.where(ray_dir_y < 0, origin_y - map_y, map_y + 1.0 - origin_y) * delta_dist_y
+    # Distance to the next x/y grid line. It is always computed as first + crossings * delta
+    # rather than summed step by step, so that the empty-space skip lands on exactly the values
+    # the plain DDA would have reached.
+    side_dist_x = first_x.copy()
+    side_dist_y = first_y.copy()
+    crossings_x = np.zeros(num_rays) # Whole numbers, kept as floats for the multiply
+    crossings_y = np.zeros(num_rays)
+
+    side = np.zeros(num_rays, dtype=np.int8)
+    wall = np.zeros(num_rays, dtype=np.uint8)
+
+    # Indices of rays that are still travelling. Each iteration advances all of them by one
+    # cell and drops the ones that hit a wall or left the map.
+    active = np.arange(num_rays)
+    max_dda_steps = map_width + map_height + 5
+    for _ in range(max_dda_steps):
+        if active.size == 0:
+            break
+        if clearance is not None:
+            _skip_empty_space(active, clearance, map_x, map_y, side_dist_x, side_dist_y, crossings_x, crossings_y,
+                              first_x, first_y, delta_dist_x, delta_dist_y, step_x, step_y)
+
+        sdx = side_dist_x[active]
+        sdy = side_dist_y[active]
+        if max_dist is not None:
+            # The next step enters a cell at min(sdx, sdy) along the ray
+            in_reach = np.minimum(sdx, sdy) <= max_dist[active]
+            active, sdx, sdy = active[in_reach], sdx[in_reach], sdy[in_reach]
+        step_in_x = sdx < sdy
+
+        ax = active[step_in_x]
+        ay = active[~step_in_x]
+        # A ray only steps in x if its x crossings are finite, so no 0 * inf to guard against here
+        count = crossings_x[ax] + 1
+        crossings_x[ax] = count
+        side_dist_x[ax] = first_x[ax] + count * delta_dist_x[ax]
+        map_x[ax] += step_x[ax]
+        side[ax] = 0
+        count = crossings_y[ay] + 1
+        crossings_y[ay] = count
+        side_dist_y[ay] = first_y[ay] + count * delta_dist_y[ay]
+        map_y[ay] += step_y[ay]
+        side[ay] = 1
+
+        mx = map_x[active]
+        my = map_y[active]
+        in_bounds = (mx >= 0) & (mx < map_width) & (my >= 0) & (my < map_height)
+        active = active[in_bounds]
+        cell = grid[my[in_bounds], mx[in_bounds]]
+        hit = cell > 0
+        wall[active[hit]] = cell[hit]
+        active = active[~hit]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dist_x = (map_x - origin_x + (1 - step_x) / 2) / ray_dir_x
+        dist_y = (map_y - origin_y + (1 - step_y) / 2) / ray_dir_y
+    dist_along_ray = np.where(side == 0, dist_x, dist_y)
+    dist_along_ray[wall == 0] = 0.0
+    return dist_along_ray, side, wall, map_x, map_y
+
+def _crossings_before(first, delta, limit, inclusive, low, high):
+    """Returns how many of a ray's x (or y) grid lines, at first + k * delta for k = 0, 1, ...,
+    lie before `limit` along it, or at it too if `inclusive`, knowing the answer is in [low, high].
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        estimate = np.floor((limit - first) / delta) + 1 # NaN for axis-parallel rays
+        crossings = np.fmin(np.fmax(estimate, low), high) # fmax/fmin skip the NaN
+        # The division can be off by one near ties; settle it with the DDA's exact expression.
+        # (0 * inf gives NaN for axis-parallel rays, which compares False, as it should.)
+        if inclusive:
+            crossings += (first + crossings * delta <= limit) & (crossings < high)
+            crossings -= (first + (crossings - 1) * delta > limit) & (crossings > low)
+        else:
+            crossings += (first + crossings * delta < limit) & (crossings < high)
+            crossings -= (first + (crossings - 1) * delta >= limit) & (crossings > low)
+    return crossings
+
+def _skip_empty_space(active, clearance, map_x, map_y, side_dist_x, side_dist_y, crossings_x, crossings_y,
+                      first_x, first_y, delta_dist_x, delta_dist_y, step_x, step_y):
+    """Advances the `active` rays in place to the edge of the empty square around their cell.
+
+    A cell with clearance r sits in the middle of a (2r+1)-cell square of empty cells, so a ray
+    can take every grid crossing that comes before it first leaves that square without looking
+    at the map. The next regular DDA step then crosses the square's edge. The crossings are
+    counted with the DDA's own comparisons (ties step in y) and distances, so the rays end up
+    in exactly the state cell-by-cell stepping would have left them in.
+    """
+    radius = clearance[map_y[active], map_x[active]]
+    jumping = radius > 0
+    if not jumping.any():
+        return
+    rays = active[jumping]
+    radius = radius[jumping].astype(np.float64)
+
+    count_x, count_y = crossings_x[rays], crossings_y[rays]
+    first_x, first_y = first_x[rays], first_y[rays]
+    ddx, ddy = delta_dist_x[rays], delta_dist_y[rays]
+    new_x, new_y = count_x + radius, count_y + radius
+    # The ray leaves the square at its (r+1)-th x or y crossing from here, whichever the DDA
+    # takes first: x only if it comes strictly first
+    exit_x = first_x + new_x * ddx
+    exit_y = first_y + new_y * ddy
+    exits_in_x = exit_x < exit_y
+    # Every y crossing up to exit_x comes before it, x crossings only strictly before exit_y
+    x, y = np.flatnonzero(exits_in_x), np.flatnonzero(~exits_in_x)
+    new_y[x] = _crossings_before(first_y[x], ddy[x], exit_x[x], True, count_y[x], new_y[x])
+    new_x[y] = _crossings_before(first_x[y], ddx[y], exit_y[y], False, count_x[y], new_x[y])
+
+    moved_x, moved_y = new_x - count_x, new_y - count_y
+    map_x[rays] += step_x[rays] * moved_x.astype(np.int64)
+    map_y[rays] += step_y[rays] * moved_y.astype(np.int64)
+    crossings_x[rays], crossings_y[rays] = new_x, new_y
+    # Only rays that crossed a line have finite distances to update (and no 0 * inf)
+    with np.errstate(invalid='ignore'):
+        side_dist_x[rays] = np.where(moved_x > 0, first_x + new_x * ddx, side_dist_x[rays])
+        side_dist_y[rays] = np.where(moved_y > 0, first_y + new_y * ddy, side_dist_y[rays])
+
+def cast_spans(origin_x, origin_y, ray_dir_x, ray_dir_y, grid=None, clearance=None, sample_spacing=None):
+    """Same results as cast() for a fan of rays from one origin, ordered by angle, while
+    running the DDA for only some of them.
+
+    Rays are cast every `sample_spacing` (default config.SPAN_SAMPLE_SPACING), then between
+    neighbouring cast rays: if both hit the same face of the same cell and the triangle they
+    form with the origin is too thin to hold a whole grid cell, every ray in between hits that
+    face too. (A wall cell the two rays miss could only block a ray in between by lying
+    entirely inside the triangle, and a triangle whose inradius is under 1/2 cannot hold a unit
+    square.) Those rays get their distance from the same closed-form expression the DDA ends
+    with. Every ray between two cast rays that disagree is cast too, all of them together in
+    a second and last call to cast(), so the DDA runs at most twice per frame.
+    """
+    if sample_spacing is None:
+        sample_spacing = config.SPAN_SAMPLE_SPACING
+    ray_dir_x = np.asarray(ray_dir_x, dtype=np.float64)
+    ray_dir_y = np.asarray(ray_dir_y, dtype=np.float64)
+    num_rays = ray_dir_x.size
+    dist_along_ray = np.zeros(num_rays)
+    side = np.zeros(num_rays, dtype=np.int8)
+    wall = np.zeros(num_rays, dtype=np.uint8)
+    map_x = np.zeros(num_rays, dtype=np.int64)
+    map_y = np.zeros(num_rays, dtype=np.int64)
+    if num_rays == 0:
+        return dist_along_ray, side, wall, map_x, map_y
+
+    def cast_some(rays):
+        if rays.size == 0:
+            return
+        dist_along_ray[rays], side[rays], wall[rays], map_x[rays], map_y[rays] = cast(
+            origin_x, origin_y, ray_dir_x[rays], ray_dir_y[rays], grid, clearance)
+
+    samples = np.unique(np.append(np.arange(0, num_rays, max(1, sample_spacing)), num_rays - 1))
+    cast_some(samples)
+    low, high = samples[:-1], samples[1:]
+    same_face = (wall[low] > 0) & (side[low] == side[high]) & \
+                (map_x[low] == map_x[high]) & (map_y[low] == map_y[high])
+    # Triangle origin - hit(low) - hit(high): inradius = 2 * area / perimeter, kept under 0.45
+    # rather than 0.5 to stay clear of rounding
+    hit_low_x, hit_low_y = dist_along_ray[low] * ray_dir_x[low], dist_along_ray[low] * ray_dir_y[low]
+    hit_high_x, hit_high_y = dist_along_ray[high] * ray_dir_x[high], dist_along_ray[high] * ray_dir_y[high]
+    twice_area = np.abs(hit_low_x * hit_high_y - hit_low_y * hit_high_x)
+    perimeter = np.hypot(hit_low_x, hit_low_y) + np.hypot(hit_high_x, hit_high_y) + \
+                np.hypot(hit_low_x - hit_high_x, hit_low_y - hit_high_y)
+    span = same_face & (twice_area < 0.45 * perimeter)
+
+    # Rays strictly inside each interval, and the interval's low end they take their face from
+    lengths = high - low - 1
+    face = np.repeat(low, lengths)
+    rays = face + 1 + np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    in_span = np.repeat(span, lengths)
+    cast_some(rays[~in_span]) # Everything between rays that disagree is cast in one go
+    face, rays = face[in_span], rays[in_span]
+
+    # Fill the rays inside the spans from their face
+    if rays.size:
+        side[rays], wall[rays], map_x[rays], map_y[rays] = side[face], wall[face], map_x[face], map_y[face]
+        # Same expression as the end of cast()
+        rdx, rdy = ray_dir_x[rays], ray_dir_y[rays]
+        step_x = np.where(rdx < 0, -1, 1)
+        step_y = np.where(rdy < 0, -1, 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dist_x = (map_x[rays] - float(origin_x) + (1 - step_x) / 2) / rdx
+            dist_y = (map_y[rays] - float(origin_y) + (1 - step_y) / 2) / rdy
+        dist_along_ray[rays] = np.where(side[rays] == 0, dist_x, dist_y)
+    return dist_along_ray, side, wall, map_x, map_y
+
+def cast_rays(player_x, player_y, player_angle, columns=None, grid=None, clearance=None):
+    """Casts config.NUM_RAYS rays across the field of view and returns a RayHits.
+
+    `columns` optionally restricts the cast to those ray indices (e.g. one band of the screen),
+    which must be consecutive for config.RAYCAST_MODE 'spans'. The rays come from the camera
+    tables (see camera.py).
+    """
+    ray_dir_x, ray_dir_y = camera.ray_directions(player_angle, columns)
+    return cast_camera_rays(player_x, player_y, ray_dir_x, ray_dir_y, grid, clearance,
+                            spans=config.RAYCAST_MODE == 'spans')
+
+def cast_camera_rays(player_x, player_y, ray_dir_x, ray_dir_y, grid=None, clearance=None, spans=False):
+    """Casts camera rays (see camera.py) from the camera positions and returns a RayHits.
+
+    The directions must have a component of 1 along their camera's view direction, so the
+    distance along them is the perpendicular distance the walls are drawn at. All arguments
+    broadcast together and the RayHits fields take their broadcast shape, so (cameras, 1)
+    positions with (cameras, rays) directions cast a whole batch of cameras in one pass.
+    With `spans`, a single camera's fan of rays is cast with cast_spans instead of cast.
+    """
+    shape = np.broadcast_shapes(np.shape(player_x), np.shape(player_y), np.shape(ray_dir_x), np.shape(ray_dir_y))
+    ray_dir_x = np.broadcast_to(ray_dir_x, shape)
+    ray_dir_y = np.broadcast_to(ray_dir_y, shape)
+
+    caster = cast_spans if spans and len(shape) == 1 and np.ndim(player_x) == np.ndim(player_y) == 0 else cast
+    dist, side, wall, _, _ = caster(player_x, player_y, ray_dir_x, ray_dir_y, grid, clearance)
+    dist, side, wall = dist.reshape(shape), side.reshape(shape), wall.reshape(shape)
+
+    # Where along the wall face the ray hit it (for texture mapping)
+    wall_hit = np.where(side == 0, player_y + dist * ray_dir_y, player_x + dist * ray_dir_x)
+    tex_u = wall_hit - np.floor(wall_hit)
+
+    dist = np.maximum(dist, 0.001)
+    dist[wall == 0] = 0.0
+    return RayHits(dist, side, wall, tex_u, ray_dir_x, ray_dir_y)
+
+def depth_buffer(hits):
+    """Returns the per-column wall distance of a RayHits, with inf where no wall was hit."""
+    return np.where(hits.wall > 0, hits.dist, np.inf)
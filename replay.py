@@ -0,0 +1,95 @@
+"""Recording and replaying the player's input, one entry per simulation tick.
+
+The simulation (simulation.py) is deterministic: the same TickInputs from the same start
+pose give the same world, whatever the frame rate. So a session is fully described by its
+start pose and the input of every tick, which is what a recording holds:
+
+    header: b'RCIN', format version, tick rate, start x, y, angle  (struct HEADER)
+    then one byte per tick: forward + 1 | (strafe + 1) << 2 | (turn + 1) << 4 | fire << 6
+
+An hour at 60 ticks per second is about 210 KiB.
+
+    python main.py --record session.rcin   # play, writing every tick's input
+    python main.py --replay session.rcin   # run the same session again
+"""
+import struct
+
+import numpy as np
+
+import config
+import simulation
+
+MAGIC = b'RCIN'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHddd')
+
+def encode_input(tick_input):
+    """Packs a TickInput (forward/strafe/turn in -1..1) into one byte."""
+    return ((tick_input.forward + 1) | (tick_input.strafe + 1) << 2 | (tick_input.turn + 1) << 4 |
+            bool(tick_input.fire) << 6)
+
+def decode_input(code):
+    """Unpacks a byte written by encode_input into a TickInput."""
+    return simulation.TickInput(forward=(code & 3) - 1, strafe=(code >> 2 & 3) - 1, turn=(code >> 4 & 3) - 1,
+                                fire=bool(code >> 6 & 1))
+
+class InputRecorder:
+    """Writes the start pose of `world` and then every tick's input to `path`."""
+
+    def __init__(self, path, world):
+        self.path = path
+        self.ticks = 0
+        self._file = open(path, 'wb')
+        player = world.player
+        self._file.write(HEADER.pack(MAGIC, FORMAT_VERSION, config.TICK_RATE, player.x, player.y, player.angle))
+
+    def record(self, tick_input):
+        """Appends the input of one tick; call it with every input passed to World.step."""
+        self._file.write(bytes((encode_input(tick_input),)))
+        self.ticks += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            print(f"Recorded {self.ticks} ticks of input to '{self.path}'.")
+
+class InputReplay:
+    """Feeds back the ticks of a recording made by InputRecorder."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise ValueError(f"'{path}' is not an input recording")
+        magic, version, tick_rate, self.x, self.y, self.angle = HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"'{path}' is not an input recording (or from an incompatible version)")
+        if tick_rate != config.TICK_RATE:
+            print(f"Warning: '{path}' was recorded at {tick_rate} ticks/s, config.TICK_RATE is {config.TICK_RATE}; "
+                  f"the replay will not match.")
+        self.path = path
+        self.codes = np.frombuffer(data, dtype=np.uint8, offset=HEADER.size)
+        self.ticks = 0 # Ticks handed out so far
+        self._inputs = {} # One TickInput per distinct byte, shared between ticks
+
+    def __len__(self):
+        return self.codes.size
+
+    def new_world(self, num_fire_frames=0):
+        """Returns a World at the recording's start pose."""
+        return simulation.World(self.x, self.y, self.angle, num_fire_frames)
+
+    def finished(self):
+        """Returns True once every recorded tick has been handed out."""
+        return self.ticks >= self.codes.size
+
+    def next_input(self):
+        """Returns the next tick's TickInput, or None after the last one. Do not modify it."""
+        if self.ticks >= self.codes.size:
+            return None
+        code = int(self.codes[self.ticks])
+        self.ticks += 1
+        tick_input = self._inputs.get(code)
+        if tick_input is None:
+            tick_input = self._inputs[code] = decode_input(code)
+        return tick_input
@@ -0,0 +1,129 @@
+"""Fixed-timestep game simulation, independent of rendering and of pygame.
+
+World.step advances the game by exactly one tick of 1 / config.TICK_RATE seconds, driven by a
+TickInput, so the same inputs always give the same result whatever the frame rate. The game
+loop runs as many ticks as real time calls for and draws the player pose interpolated between
+the last two ticks; bots, replays and servers can call step() in a tight loop instead.
+"""
+import math
+
+import config
+import map as game_map
+
+class TickInput:
+    """What the player does during one tick.
+
+    forward: +1 forward, -1 back. strafe: +1 right, -1 left. turn: +1 right, -1 left.
+    fire: pull the trigger (ignored while the weapon is still firing).
+    """
+    __slots__ = ('forward', 'strafe', 'turn', 'fire')
+
+    def __init__(self, forward=0, strafe=0, turn=0, fire=False):
+        self.forward = forward
+        self.strafe = strafe
+        self.turn = turn
+        self.fire = fire
+
+IDLE_INPUT = TickInput()
+
+class Player:
+    """Player pose at the current tick and at the tick before, for interpolation."""
+    __slots__ = ('x', 'y', 'angle', 'prev_x', 'prev_y', 'prev_angle')
+
+    def __init__(self, x, y, angle):
+        self.x = self.prev_x = x
+        self.y = self.prev_y = y
+        self.angle = self.prev_angle = angle
+
+    def interpolate(self, alpha):
+        """Returns (x, y, angle) a fraction `alpha` (0..1) of the way from the previous tick to this one."""
+        x = self.prev_x + (self.x - self.prev_x) * alpha
+        y = self.prev_y + (self.y - self.prev_y) * alpha
+        turn = (self.angle - self.prev_angle + math.pi) % (2 * math.pi) - math.pi # Shortest way round
+        angle = (self.prev_angle + turn * alpha) % (2 * math.pi)
+        return x, y, angle
+
+class Weapon:
+    """Firing animation state. frame_index indexes the fire frames while firing."""
+    __slots__ = ('num_fire_frames', 'firing', 'frame_index', 'timer_ms')
+
+    def __init__(self, num_fire_frames=0):
+        self.num_fire_frames = num_fire_frames # 0 disables firing
+        self.firing = False
+        self.frame_index = 0
+        self.timer_ms = 0.0
+
+class World:
+    """Everything the simulation updates; advance it with step()."""
+    __slots__ = ('player', 'weapon', 'tick', 'shots_fired')
+
+    def __init__(self, x=None, y=None, angle=None, num_fire_frames=0):
+        self.player = Player(config.PLAYER_INITIAL_X if x is None else x,
+                             config.PLAYER_INITIAL_Y if y is None else y,
+                             config.PLAYER_INITIAL_ANGLE if angle is None else angle)
+        self.weapon = Weapon(num_fire_frames)
+        self.tick = 0
+        self.shots_fired = 0
+
+    def step(self, tick_input=IDLE_INPUT):
+        """Advances the world by one tick."""
+        player = self.player
+        player.prev_x, player.prev_y, player.prev_angle = player.x, player.y, player.angle
+        self._update_weapon(tick_input.fire)
+
+        # Movement uses the angle from the start of the tick, then the turn is applied
+        angle = player.angle
+        move_x = move_y = 0.0
+        if tick_input.forward:
+            move_x += tick_input.forward * config.MOVE_SPEED * math.cos(angle)
+            move_y += tick_input.forward * config.MOVE_SPEED * math.sin(angle)
+        if tick_input.strafe:
+            strafe_angle = angle + math.copysign(config.STRAFE_ANGLE, tick_input.strafe)
+            move_x += abs(tick_input.strafe) * config.MOVE_SPEED * math.cos(strafe_angle)
+            move_y += abs(tick_input.strafe) * config.MOVE_SPEED * math.sin(strafe_angle)
+        if tick_input.turn:
+            player.angle = (angle + tick_input.turn * config.ROT_SPEED + 2 * math.pi) % (2 * math.pi)
+        if move_x or move_y:
+            self._move(move_x, move_y)
+        self.tick += 1
+
+    def _update_weapon(self, fire):
+        weapon = self.weapon
+        if fire and not weapon.firing and weapon.num_fire_frames > 0:
+            weapon.firing = True
+            weapon.frame_index = 0
+            weapon.timer_ms = config.PISTOL_FIRE_ANIMATION_SPEED_MS
+            self.shots_fired += 1
+        if weapon.firing:
+            weapon.timer_ms -= 1000.0 / config.TICK_RATE
+            if weapon.timer_ms <= 0:
+                weapon.frame_index += 1
+                if weapon.frame_index >= weapon.num_fire_frames:
+                    # Animation finished
+                    weapon.firing = False
+                    weapon.frame_index = 0
+                else:
+                    weapon.timer_ms = config.PISTOL_FIRE_ANIMATION_SPEED_MS
+
+    def _move(self, move_x, move_y):
+        """Moves the player with wall sliding: the x and y components are checked separately."""
+        player = self.player
+        grid = game_map.GRID
+        new_x = player.x + move_x
+        new_y = player.y + move_y
+        # X first; the y check then uses the possibly updated x
+        if 0 <= int(new_x) < game_map.MAP_WIDTH and 0 <= int(player.y) < game_map.MAP_HEIGHT and \
+           grid[int(player.y), int(new_x)] == 0:
+            player.x = new_x
+        if 0 <= int(player.x) < game_map.MAP_WIDTH and 0 <= int(new_y) < game_map.MAP_HEIGHT and \
+           grid[int(new_y), int(player.x)] == 0:
+            player.y = new_y
+
+def run(world, inputs):
+    """Steps `world` once per TickInput in `inputs` as fast as possible; returns the ticks run."""
+    step = world.step
+    ticks = 0
+    for tick_input in inputs:
+        step(tick_input)
+        ticks += 1
+    return ticks